@@ -22,11 +22,30 @@ Gx = 550662630222773436695787188951685343262506034537775941755001873603891167292
 Gy = 32670510020758816978083085130507043184471273380659243275938904335757337482424
 G = (Gx, Gy)
 
+SECP256K1 = (P, N, A, B, Gx, Gy)
+
+# GLV endomorphism of secp256k1: (beta * x, y) = lambda * (x, y), with
+# (a1, b1), (a2, b2) a short basis of the lattice {(x, y): x + y*lambda = 0 mod N}
+GLV_BETA = 0x7ae96a2b657c07106e64479eac3434e99cf0497512f58995c1396c28719501ee
+GLV_LAMBDA = 0x5363ad4cc05c30e0a5261c028812645a122e22ea20816678df02967c1b23bd72
+GLV_A1 = 0x3086d221a7d46bcde86c90e49284eb15
+GLV_B1 = -0xe4437ed6010e88286f547fa90abfe4c3
+GLV_A2 = 0x114ca50f7a8e2f3f657c1108d9d44cfd8
+GLV_B2 = GLV_A1
+
+# Only valid on secp256k1, turned off by change_curve for any other curve
+is_secp256k1 = True
+use_glv = True
+
 
 def change_curve(p, n, a, b, gx, gy):
-    global P, N, A, B, Gx, Gy, G
+    global P, N, A, B, Gx, Gy, G, _G_table, is_secp256k1, use_glv, _coincurve
     P, N, A, B, Gx, Gy = p, n, a, b, gx, gy
     G = (Gx, Gy)
+    _G_table = None
+    is_secp256k1 = (P, N, A, B, Gx, Gy) == SECP256K1
+    use_glv = is_secp256k1
+    _coincurve = backend == 'coincurve' and is_secp256k1
 
 
 def getG():
@@ -107,10 +126,18 @@ def jacobian_add(p, q):
         return q
     if not q[1]:
         return p
-    U1 = (p[0] * q[2] ** 2) % P
-    U2 = (q[0] * p[2] ** 2) % P
-    S1 = (p[1] * q[2] ** 3) % P
-    S2 = (q[1] * p[2] ** 3) % P
+    if q[2] == 1:
+        # Mixed addition, q is affine (as table entries are)
+        pz2 = (p[2] * p[2]) % P
+        U1 = p[0]
+        U2 = (q[0] * pz2) % P
+        S1 = p[1]
+        S2 = (q[1] * pz2 * p[2]) % P
+    else:
+        U1 = (p[0] * q[2] ** 2) % P
+        U2 = (q[0] * p[2] ** 2) % P
+        S1 = (p[1] * q[2] ** 3) % P
+        S2 = (q[1] * p[2] ** 3) % P
     if U1 == U2:
         if S1 != S2:
             return (0, 0, 1)
@@ -131,26 +158,360 @@ def from_jacobian(p):
     return ((p[0] * z**2) % P, (p[1] * z**3) % P)
 
 
+def batch_to_affine(points):
+    # Montgomery's simultaneous inversion: invert the product of every z
+    # once, then peel off each 1/z with two multiplications
+    prefix = []
+    acc = 1
+    for p in points:
+        prefix.append(acc)
+        if p[1]:
+            acc = (acc * p[2]) % P
+    acc_inv = inv(acc, P)
+    out = [(0, 0)] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        p = points[i]
+        if not p[1]:
+            continue
+        z = (acc_inv * prefix[i]) % P
+        acc_inv = (acc_inv * p[2]) % P
+        z2 = (z * z) % P
+        out[i] = ((p[0] * z2) % P, (p[1] * z2 * z) % P)
+    return out
+
+
+def jacobian_eq(p, q):
+    # Compares x1/z1^2 == x2/z2^2 and y1/z1^3 == y2/z2^3 without inverting
+    if not p[1] or not q[1]:
+        return not p[1] and not q[1]
+    pz2, qz2 = (p[2] * p[2]) % P, (q[2] * q[2]) % P
+    return (p[0] * qz2 - q[0] * pz2) % P == 0 and \
+        (p[1] * qz2 * q[2] - q[1] * pz2 * p[2]) % P == 0
+
+
+# Fixed-base multiplication for G: a lazily built table holding
+# d * 2^(w*j) * G for every w-bit window j and digit d, so that n * G
+# is one table lookup and addition per window and needs no doublings
+
+G_TABLE_WINDOW = 6
+_G_table = None
+
+
+def get_G_table():
+    global _G_table
+    if _G_table is None or _G_table[0] != G:
+        w = G_TABLE_WINDOW
+        rows = []
+        base = to_jacobian(G)
+        for _ in range(-(-N.bit_length() // w)):
+            row = [base]
+            for _ in range(2, 2 ** w):
+                row.append(jacobian_add(row[-1], base))
+            rows.append(row)
+            base = jacobian_add(row[-1], base)
+        flat = batch_to_affine([p for row in rows for p in row])
+        step = 2 ** w - 1
+        rows = [[None] + [to_jacobian(p) for p in flat[i:i + step]]
+                for i in range(0, len(flat), step)]
+        _G_table = (G, rows)
+    return _G_table[1]
+
+
+def jacobian_multiply_G(n):
+    n = n % N
+    mask = (1 << G_TABLE_WINDOW) - 1
+    result = (0, 0, 1)
+    for row in get_G_table():
+        if not n:
+            break
+        d = n & mask
+        if d:
+            result = jacobian_add(result, row[d])
+        n >>= G_TABLE_WINDOW
+    return result
+
+
+# Variable-base multiplication: iterative width-w NAF. Digits are odd and
+# in (-2^(w-1), 2^(w-1)), with at least w-1 zeros after each non-zero
+# digit, so a 256-bit scalar costs 256 doublings but only ~256/(w+1)
+# additions against a table of the odd multiples a, 3a, ..., (2^(w-1)-1)a
+
+
+def to_wnaf(n, w):
+    # Least significant digit first
+    digits = []
+    while n:
+        if n & 1:
+            d = n & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            n -= d
+        else:
+            d = 0
+        digits.append(d)
+        n >>= 1
+    return digits
+
+
+def wnaf_window(uses=1):
+    # Building the table costs 2^(w-2) additions once, which pays for
+    # itself as the base is reused across more scalars
+    best, best_cost = 2, None
+    for w in range(2, 9):
+        cost = 2 ** (w - 2) + uses * N.bit_length() / (w + 1)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = w, cost
+    return best
+
+
+def jacobian_wnaf_table(a, w):
+    return jacobian_wnaf_tables([a], w)[0]
+
+
+def jacobian_wnaf_tables(points, w):
+    # Tables of several bases, normalized to affine with one inversion
+    size = 2 ** (w - 2)
+    flat = []
+    for a in points:
+        a2 = jacobian_double(a)
+        flat.append(a)
+        for _ in range(size - 1):
+            flat.append(jacobian_add(flat[-1], a2))
+    flat = [to_jacobian(p) for p in batch_to_affine(flat)]
+    return [flat[i:i + size] for i in range(0, len(flat), size)]
+
+
+def jacobian_wnaf_multiply(table, n, w):
+    result = (0, 0, 1)
+    for d in reversed(to_wnaf(n, w)):
+        result = jacobian_double(result)
+        if d > 0:
+            result = jacobian_add(result, table[d >> 1])
+        elif d < 0:
+            p = table[(-d) >> 1]
+            result = jacobian_add(result, (p[0], (P - p[1]) % P, p[2]))
+    return result
+
+
+def glv_split(n):
+    # n = n1 + n2 * lambda (mod N) with |n1|, |n2| around sqrt(N)
+    c1 = (GLV_B2 * n + N // 2) // N
+    c2 = (-GLV_B1 * n + N // 2) // N
+    n1 = n - c1 * GLV_A1 - c2 * GLV_A2
+    n2 = -c1 * GLV_B1 - c2 * GLV_B2
+    return n1, n2
+
+
+def jacobian_glv_multiply(table, n, w):
+    # Joint double-scalar ladder over n1 * a + n2 * phi(a), which
+    # needs ~128 doublings instead of ~256
+    n1, n2 = glv_split(n)
+    t1 = table if n1 >= 0 else [(p[0], P - p[1], p[2]) for p in table]
+    t2 = [((GLV_BETA * p[0]) % P, p[1] if n2 >= 0 else P - p[1], p[2])
+          for p in table]
+    d1, d2 = to_wnaf(abs(n1), w), to_wnaf(abs(n2), w)
+    d1 += [0] * (len(d2) - len(d1))
+    d2 += [0] * (len(d1) - len(d2))
+    result = (0, 0, 1)
+    for i in range(len(d1) - 1, -1, -1):
+        result = jacobian_double(result)
+        for d, t in ((d1[i], t1), (d2[i], t2)):
+            if d > 0:
+                result = jacobian_add(result, t[d >> 1])
+            elif d < 0:
+                p = t[(-d) >> 1]
+                result = jacobian_add(result, (p[0], (P - p[1]) % P, p[2]))
+    return result
+
+
 def jacobian_multiply(a, n):
     if a[1] == 0 or n == 0:
         return (0, 0, 1)
+    if _coincurve:
+        return to_jacobian(coincurve_multiply(a[:2] if a[2] == 1 else from_jacobian(a), n))
+    if a[0] == Gx and a[1] == Gy and a[2] == 1:
+        return jacobian_multiply_G(n)
+    if n < 0 or n >= N:
+        n = n % N
+    if n == 0:
+        return (0, 0, 1)
     if n == 1:
         return a
-    if n < 0 or n >= N:
-        return jacobian_multiply(a, n % N)
-    if (n % 2) == 0:
-        return jacobian_double(jacobian_multiply(a, n//2))
-    if (n % 2) == 1:
-        return jacobian_add(jacobian_double(jacobian_multiply(a, n//2)), a)
+    w = wnaf_window(1)
+    if use_glv:
+        return jacobian_glv_multiply(jacobian_wnaf_table(a, w), n, w)
+    return jacobian_wnaf_multiply(jacobian_wnaf_table(a, w), n, w)
+
+
+def jacobian_multiply_table(a, table, n, w):
+    # Multiplies a by n against table = jacobian_wnaf_table(a, w) built
+    # ahead of time, for fixed bases multiplied by many different scalars
+    if _coincurve:
+        return jacobian_multiply(a, n)
+    n = n % N
+    if a[1] == 0 or n == 0:
+        return (0, 0, 1)
+    if use_glv:
+        return jacobian_glv_multiply(table, n, w)
+    return jacobian_wnaf_multiply(table, n, w)
 
 
 def fast_multiply(a, n):
+    if _coincurve:
+        return coincurve_multiply(a, n)
     return from_jacobian(jacobian_multiply(to_jacobian(a), n))
 
 
 def fast_add(a, b):
+    if _coincurve:
+        return coincurve_combine([a, b])
     return from_jacobian(jacobian_add(to_jacobian(a), to_jacobian(b)))
 
+# Multi-scalar multiplication: Straus (interleaved wNAF) for up to
+# STRAUS_MAX_TERMS terms, Pippenger's bucket method beyond
+
+STRAUS_MAX_TERMS = 128
+STRAUS_WINDOW = 5
+
+
+def jacobian_straus(pairs):
+    # Every term's wNAF digits (of both GLV halves on secp256k1) are
+    # added in along one shared chain of doublings, ~128 of them with
+    # GLV, instead of a chain per term
+    w = STRAUS_WINDOW
+    columns = []
+    tables = jacobian_wnaf_tables([p for p, _ in pairs], w)
+    for (p, s), table in zip(pairs, tables):
+        if use_glv:
+            n1, n2 = glv_split(s)
+            t1 = table if n1 >= 0 else [(q[0], P - q[1], q[2]) for q in table]
+            t2 = [((GLV_BETA * q[0]) % P, q[1] if n2 >= 0 else P - q[1], q[2])
+                  for q in table]
+            columns += [(to_wnaf(abs(n1), w), t1), (to_wnaf(abs(n2), w), t2)]
+        else:
+            columns.append((to_wnaf(s, w), table))
+    result = (0, 0, 1)
+    for i in range(max(len(d) for d, _ in columns) - 1, -1, -1):
+        result = jacobian_double(result)
+        for digits, t in columns:
+            if i >= len(digits):
+                continue
+            d = digits[i]
+            if d > 0:
+                result = jacobian_add(result, t[d >> 1])
+            elif d < 0:
+                q = t[(-d) >> 1]
+                result = jacobian_add(result, (q[0], (P - q[1]) % P, q[2]))
+    return result
+
+
+def pippenger_window(n):
+    # Cost of a c-bit window over b-bit scalars is roughly
+    # ceil(b / c) * (n + 2^(c+1)) additions; pick the cheapest c
+    bits = N.bit_length()
+    best, best_cost = 1, None
+    for c in range(1, 17):
+        cost = -(-bits // c) * (n + 2 ** (c + 1))
+        if best_cost is None or cost < best_cost:
+            best, best_cost = c, cost
+    return best
+
+
+def jacobian_multiexp(points, scalars):
+    if _coincurve:
+        return to_jacobian(coincurve_multiexp(batch_to_affine(points), scalars))
+    pairs = [(p, s % N) for p, s in zip(points, scalars)]
+    pairs = [(p, s) for p, s in pairs if s and p[1]]
+    if not pairs:
+        return (0, 0, 1)
+    if len(pairs) == 1:
+        return jacobian_multiply(pairs[0][0], pairs[0][1])
+    if len(pairs) <= STRAUS_MAX_TERMS:
+        return jacobian_straus(pairs)
+    c = pippenger_window(len(pairs))
+    mask = (1 << c) - 1
+    bits = max(s for _, s in pairs).bit_length()
+    result = (0, 0, 1)
+    for shift in range(((bits - 1) // c) * c, -1, -c):
+        for _ in range(c):
+            result = jacobian_double(result)
+        buckets = [None] * (mask + 1)
+        for p, s in pairs:
+            d = (s >> shift) & mask
+            if d:
+                buckets[d] = p if buckets[d] is None else jacobian_add(buckets[d], p)
+        # sum_d d * bucket[d] via running sums from the top bucket down
+        running = (0, 0, 1)
+        window = (0, 0, 1)
+        for d in range(mask, 0, -1):
+            if buckets[d] is not None:
+                running = jacobian_add(running, buckets[d])
+            window = jacobian_add(window, running)
+        result = jacobian_add(result, window)
+    return result
+
+
+def multiexp(points, scalars):
+    if _coincurve:
+        return coincurve_multiexp(points, scalars)
+    return from_jacobian(jacobian_multiexp([to_jacobian(p) for p in points], scalars))
+
+# Point arithmetic backends: 'python' is the code above, 'coincurve' routes
+# multiplication, addition and multi-scalar multiplication of affine points
+# to libsecp256k1. Select with set_backend() or $PYBITCOINTOOLS_BACKEND.
+# libsecp256k1 only knows secp256k1, so after change_curve to any other
+# curve the python backend is used regardless
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+BACKENDS = ('python', 'coincurve')
+backend = 'python'
+_coincurve = False
+
+
+def set_backend(name):
+    global backend, _coincurve
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend: %s" % name)
+    if name == 'coincurve' and coincurve is None:
+        raise Exception("coincurve backend requested but coincurve is not installed")
+    backend = name
+    _coincurve = backend == 'coincurve' and is_secp256k1
+
+
+def get_backend():
+    return backend
+
+
+def coincurve_multiply(a, n):
+    n = n % N
+    if not n or isinf(a):
+        return (0, 0)
+    if a[0] == Gx and a[1] == Gy:
+        return coincurve.PrivateKey(n.to_bytes(32, 'big')).public_key.point()
+    return coincurve.PublicKey.from_point(a[0], a[1]).multiply(n.to_bytes(32, 'big')).point()
+
+
+def coincurve_combine(points):
+    keys = [coincurve.PublicKey.from_point(p[0], p[1]) for p in points if not isinf(p)]
+    if not keys:
+        return (0, 0)
+    try:
+        return coincurve.PublicKey.combine_keys(keys).point()
+    except ValueError:
+        # libsecp256k1 refuses to return the point at infinity
+        return (0, 0)
+
+
+def coincurve_multiexp(points, scalars):
+    return coincurve_combine([coincurve_multiply(p, s) for p, s in zip(points, scalars)])
+
+
+set_backend(os.environ.get('PYBITCOINTOOLS_BACKEND', 'python'))
+
 # Functions for handling pubkey and privkey formats
 
 
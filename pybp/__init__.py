@@ -3,4 +3,10 @@ from . import types
 from . import pederson
 from . import innerproduct
 from . import vectors
-from . import rangeproof
\ No newline at end of file
+from . import context
+from . import rangeproof
+from . import serialize
+from . import parallel
+from . import archive
+from . import stats
+from . import tracing
\ No newline at end of file
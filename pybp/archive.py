@@ -0,0 +1,211 @@
+"""
+Append-only archives of range proofs
+
+Layout: magic, version (1 byte), bitlength (1 byte), m (2 bytes big
+endian), record size (4 bytes big endian), then fixed-size records of
+
+    V_1..V_m (compressed, 33 bytes each) || proof (RangeProof.to_bytes)
+
+All proofs in an archive share the bitlength and aggregation size, so
+every record has the same size and record i is at a fixed offset.
+"""
+import os
+import mmap
+
+from typing import Dict, Iterator, List, Tuple, Union
+
+from pybp.rangeproof import RangeProof
+from pybp.serialize import POINT_SIZE, PROOF_HEADER_SIZE, ProofView, \
+    as_proof_bytes, commitments_from_bytes, commitments_to_bytes
+from pybp.types import Point
+
+ARCHIVE_MAGIC = b'PYBPARCH'
+ARCHIVE_VERSION = 2
+ARCHIVE_HEADER_SIZE = len(ARCHIVE_MAGIC) + 1 + 1 + 2 + 4
+
+
+def get_record_size(bitlength: int, m: int) -> int:
+    rounds = (bitlength * m).bit_length() - 1
+    return POINT_SIZE * m + PROOF_HEADER_SIZE + 2 * POINT_SIZE * rounds
+
+
+def encode_archive_header(bitlength: int, m: int) -> bytes:
+    return ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION, bitlength]) + \
+        m.to_bytes(2, 'big') + get_record_size(bitlength, m).to_bytes(4, 'big')
+
+
+def decode_archive_header(header: bytes) -> Tuple[int, int, int]:
+    """
+    returns: (bitlength, m, record size)
+    """
+    if len(header) < ARCHIVE_HEADER_SIZE or header[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise Exception('Not a proof archive')
+
+    offset = len(ARCHIVE_MAGIC)
+    if header[offset] != ARCHIVE_VERSION:
+        raise Exception('Unsupported proof archive version {}'.format(header[offset]))
+
+    bitlength = header[offset + 1]
+    m = int.from_bytes(header[offset + 2:offset + 4], 'big')
+    record_size = int.from_bytes(header[offset + 4:offset + 8], 'big')
+
+    if record_size != get_record_size(bitlength, m):
+        raise Exception('Proof archive record size does not match its header')
+
+    return (bitlength, m, record_size)
+
+
+class ArchiveWriter:
+    """
+    Appends proofs to an archive, creating it (and writing the header)
+    if it doesn't exist yet. An existing archive must have been written
+    for the same bitlength and m; a torn record at its end is discarded.
+
+        with ArchiveWriter(path, 64) as archive:
+            archive.append(rp.get_proof_dict(), rp.V)
+    """
+
+    def __init__(self, path: str, bitlength: int, m: int = 1):
+        self.bitlength = bitlength
+        self.m = m
+        self.record_size = get_record_size(bitlength, m)
+
+        self.f = open(path, 'ab')
+
+        try:
+            if self.f.tell() == 0:
+                self.f.write(encode_archive_header(bitlength, m))
+            else:
+                with open(path, 'rb') as existing:
+                    header = decode_archive_header(existing.read(ARCHIVE_HEADER_SIZE))
+                if header != (bitlength, m, self.record_size):
+                    raise Exception('Proof archive holds {}-bit proofs over {} values'.format(
+                        header[0], header[1]))
+
+                # Drop a partially written trailing record, which the
+                # reader ignores, so new records stay aligned
+                size = self.f.tell()
+                complete = (size - ARCHIVE_HEADER_SIZE) // self.record_size
+                if ARCHIVE_HEADER_SIZE + complete * self.record_size != size:
+                    self.f.truncate(ARCHIVE_HEADER_SIZE + complete * self.record_size)
+        except BaseException:
+            self.f.close()
+            raise
+
+    def append(self, proof: Union[Dict, ProofView, bytes], V: Union[Point, List[Point]]):
+        """
+        proof: anything `pybp.serialize.as_proof_bytes` accepts
+        """
+        record = commitments_to_bytes(V) + as_proof_bytes(proof)
+        if len(record) != self.record_size:
+            raise Exception('Proof does not match the archive bitlength and m')
+
+        self.f.write(record)
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Memory-maps an archive. Each record is copied out of the map (about
+    a kilobyte) and parsed lazily, so iterating never holds more than
+    the current record in memory, and proofs stay valid after `close`
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            # mmap refuses empty files, and shorter ones have no header
+            if os.fstat(f.fileno()).st_size < ARCHIVE_HEADER_SIZE:
+                raise Exception('Not a proof archive')
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.bitlength, self.m, self.record_size = decode_archive_header(
+                self.mm[:ARCHIVE_HEADER_SIZE])
+        except BaseException:
+            self.mm.close()
+            raise
+
+        # A partially written trailing record is ignored
+        self.count = (len(self.mm) - ARCHIVE_HEADER_SIZE) // self.record_size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> Tuple[ProofView, Union[Point, List[Point]]]:
+        """
+        returns: (proof, V) of record `index`
+        """
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        offset = ARCHIVE_HEADER_SIZE + index * self.record_size
+        proof_offset = offset + POINT_SIZE * self.m
+
+        record = memoryview(self.mm[offset:offset + self.record_size])
+        split = proof_offset - offset
+
+        return (
+            ProofView(record[split:]),
+            commitments_from_bytes(record[:split])
+        )
+
+    def __iter__(self) -> Iterator[Tuple[ProofView, Union[Point, List[Point]]]]:
+        for index in range(self.count):
+            yield self[index]
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_archive(path: str) -> Iterator[Tuple[ProofView, Union[Point, List[Point]]]]:
+    """
+    Yields (proof, V) for every record of the archive at `path`
+    """
+    with ArchiveReader(path) as reader:
+        yield from reader
+
+
+def verify_archive(path: str, batch_size: int = 64) -> List[int]:
+    """
+    Re-verifies every proof in an archive, `batch_size` records at a
+    time with `RangeProof.verify_batch`
+
+    returns: indices of the invalid records
+    """
+    invalid = []
+
+    with ArchiveReader(path) as reader:
+        rp = RangeProof(reader.bitlength, reader.m)
+
+        for start in range(0, len(reader), batch_size):
+            batch = []
+            indices = []
+            for index in range(start, min(start + batch_size, len(reader))):
+                try:
+                    batch.append(reader[index])
+                    indices.append(index)
+                except ValueError:
+                    # Commitments which don't decode fail on their own
+                    invalid.append(index)
+
+            if not rp.verify_batch(batch):
+                invalid += [indices[i] for i in rp.find_invalid(batch)]
+
+    return sorted(invalid)
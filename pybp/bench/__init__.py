@@ -0,0 +1,152 @@
+"""
+Benchmarks for pybp
+
+    python -m pybp.bench micro [-o results.json]
+    python -m pybp.bench e2e [-o results.json] [--csv results.csv]
+    python -m pybp.bench compare baseline.json results.json
+
+Every benchmark is timed after `warmup` untimed runs, over `repeat`
+samples of `number` calls each (calibrated so a sample takes at least
+`min_time` seconds). Results are JSON, with per call statistics in
+seconds, so a run can be saved as a baseline and compared against later.
+"""
+import sys
+import csv
+import json
+import math
+import time
+import platform
+import statistics
+
+import pybitcointools as B
+
+from typing import Callable, Dict, List
+
+
+def measure(fn: Callable[[], object],
+            warmup: int = 2,
+            repeat: int = 7,
+            number: int = 0,
+            min_time: float = 0.02) -> Dict:
+    """
+    Times `fn`, picking `number` (calls per sample) if it is 0
+
+    returns: dict of the settings used and per call statistics
+    """
+    for _ in range(warmup):
+        fn()
+
+    if number <= 0:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_time or number >= 1 << 20:
+                break
+            number *= 2
+
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    return dict(summarize(samples), warmup=warmup, repeat=repeat, number=number)
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list
+    """
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+
+    return {
+        'count': len(samples),
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': statistics.mean(samples),
+        'median': statistics.median(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'p90': percentile(ordered, 90),
+        'p99': percentile(ordered, 99)
+    }
+
+
+def get_metadata() -> Dict:
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'backend': B.get_backend(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.1, stat: str = 'median') -> List[Dict]:
+    """
+    Compares the benchmarks present in both result sets
+
+    returns: one entry per benchmark with the ratio current / baseline
+    of `stat`, flagged as a regression when it exceeds 1 + threshold
+    and as an improvement when it is below 1 / (1 + threshold)
+    """
+    rows = []
+
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+
+        ratio = result[stat] / baseline['results'][name][stat]
+        rows.append({
+            'name': name,
+            'baseline': baseline['results'][name][stat],
+            'current': result[stat],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+            'improvement': ratio < 1 / (1 + threshold)
+        })
+
+    return rows
+
+
+def print_comparison(rows: List[Dict], out=sys.stdout):
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else \
+            'improved' if row['improvement'] else ''
+        out.write('{:<40} {:>12.3f}us {:>12.3f}us {:>7.2f}x {}\n'.format(
+            row['name'], row['baseline'] * 1e6, row['current'] * 1e6,
+            row['ratio'], flag))
+
+
+def load_results(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_csv(results: Dict, path: str):
+    """
+    One row per benchmark, one column per statistic
+    """
+    columns = sorted({key for result in results['results'].values() for key in result})
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name'] + columns)
+        for name, result in results['results'].items():
+            writer.writerow([name] + [result.get(column, '') for column in columns])
+
+
+def write_results(results: Dict, path: str = None):
+    body = json.dumps(results, indent=2, sort_keys=True)
+
+    if path is None:
+        sys.stdout.write(body + '\n')
+    else:
+        with open(path, 'w') as f:
+            f.write(body + '\n')
@@ -0,0 +1,94 @@
+import sys
+import argparse
+
+from pybp.bench import compare, load_results, print_comparison, write_csv, write_results
+
+
+def check_comparable(baseline, current):
+    for key in ['backend', 'python', 'machine']:
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            sys.stderr.write('warning: baseline {} is {}, current is {}\n'.format(
+                key, baseline['meta'].get(key), current['meta'].get(key)))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m pybp.bench', description='pybp benchmarks')
+    commands = parser.add_subparsers(dest='command')
+
+    micro = commands.add_parser('micro', help='Time the EC, scalar, Vector, NUMS and transcript primitives')
+    micro.add_argument('-k', '--filter', default='',
+                       help='Only run benchmarks whose name matches this regex')
+    micro.add_argument('--warmup', type=int, default=2)
+    micro.add_argument('--repeat', type=int, default=7)
+    micro.add_argument('--min-time', type=float, default=0.02,
+                       help='Minimum seconds per sample')
+    micro.add_argument('-o', '--output', default=None,
+                       help='Write the JSON results here rather than to stdout')
+    micro.add_argument('--baseline', default=None,
+                       help='Also compare against these saved results')
+    micro.add_argument('--threshold', type=float, default=0.1)
+
+    e2e = commands.add_parser('e2e', help='Prove and verify a reproducible corpus of range proofs')
+    e2e.add_argument('--bitlengths', type=int, nargs='+', default=[8, 16, 32, 64])
+    e2e.add_argument('--m', type=int, nargs='+', default=[1, 2],
+                     help='Aggregation sizes')
+    e2e.add_argument('--count', type=int, default=16,
+                     help='Proofs per bitlength and aggregation size')
+    e2e.add_argument('--seed', type=int, default=0)
+    e2e.add_argument('--save-corpus', default=None,
+                     help='Archive the corpora as <prefix><bitlength>x<m>.pybp')
+    e2e.add_argument('-o', '--output', default=None,
+                     help='Write the JSON results here rather than to stdout')
+    e2e.add_argument('--csv', default=None, help='Also write the results as CSV')
+    e2e.add_argument('--baseline', default=None,
+                     help='Also compare against these saved results')
+    e2e.add_argument('--threshold', type=float, default=0.1)
+
+    cmp = commands.add_parser('compare', help='Flag regressions between two saved results')
+    cmp.add_argument('baseline')
+    cmp.add_argument('current')
+    cmp.add_argument('--threshold', type=float, default=0.1,
+                     help='Relative slowdown of the median flagged as a regression')
+
+    args = parser.parse_args()
+
+    if args.command in ['micro', 'e2e']:
+        progress = lambda name, r: sys.stderr.write(
+            '{:<40} {:>12.3f}us\n'.format(name, r['median'] * 1e6))
+
+        if args.command == 'micro':
+            from pybp.bench import micro
+
+            results = micro.run(args.filter, warmup=args.warmup, repeat=args.repeat,
+                                min_time=args.min_time, progress=progress)
+        else:
+            from pybp.bench import e2e
+
+            results = e2e.run(args.bitlengths, args.m, count=args.count, seed=args.seed,
+                              save_corpus=args.save_corpus, progress=progress)
+            if args.csv:
+                write_csv(results, args.csv)
+
+        write_results(results, args.output)
+
+        if args.baseline:
+            baseline = load_results(args.baseline)
+            check_comparable(baseline, results)
+            rows = compare(baseline, results, args.threshold)
+            print_comparison(rows, sys.stderr)
+            sys.exit(1 if any(row['regression'] for row in rows) else 0)
+
+    elif args.command == 'compare':
+        baseline, current = load_results(args.baseline), load_results(args.current)
+        check_comparable(baseline, current)
+        rows = compare(baseline, current, args.threshold)
+        print_comparison(rows)
+        sys.exit(1 if any(row['regression'] for row in rows) else 0)
+
+    else:
+        parser.print_help()
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
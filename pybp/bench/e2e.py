@@ -0,0 +1,144 @@
+"""
+End-to-end benchmark: builds a reproducible corpus of range proofs and
+times proving, single verification and batch verification
+"""
+import os
+import random
+import time
+
+import pybitcointools as B
+
+from typing import Callable, Dict, List, Tuple, Union
+
+from pybp.archive import ArchiveWriter
+from pybp.bench import get_metadata, summarize
+from pybp.context import get_context
+from pybp.rangeproof import RangeProof
+from pybp.serialize import ProofView
+from pybp.types import Point, Scalar
+from pybp.utils import getNUMS, get_generators
+
+BITLENGTHS = [8, 16, 32, 64]
+AGGREGATION_SIZES = [1, 2]
+
+Corpus = List[Tuple[ProofView, Union[Point, List[Point]], List[Scalar]]]
+
+
+def build_corpus(bitlength: int, m: int, count: int, seed: int
+                 ) -> Tuple[Corpus, List[float]]:
+    """
+    Proves `count` proofs over values and blinding factors drawn from an
+    RNG seeded by (seed, bitlength, m), so the same arguments always
+    give the same proofs
+
+    returns: (list of (proof, V, values), prover latencies in seconds)
+    """
+    rng = random.Random('{}/{}x{}'.format(seed, bitlength, m))
+    corpus = []
+    latencies = []
+
+    for _ in range(count):
+        values = [rng.randrange(2 ** bitlength) for _ in range(m)]
+
+        start = time.perf_counter()
+        rp = RangeProof(bitlength, m, randbytes=rng.randbytes)
+        rp.generate_proof(values)
+        latencies.append(time.perf_counter() - start)
+
+        corpus.append((ProofView(rp.to_bytes()), rp.V, values))
+
+    return (corpus, latencies)
+
+
+def time_verify(bitlength: int, m: int, corpus: Corpus) -> List[float]:
+    latencies = []
+
+    for proof, V, _ in corpus:
+        start = time.perf_counter()
+        ok = RangeProof(bitlength, m).verify(V=V, **proof)
+        latencies.append(time.perf_counter() - start)
+
+        assert ok, 'Corpus proof failed to verify'
+
+    return latencies
+
+
+def time_verify_batch(bitlength: int, m: int, corpus: Corpus, repeat: int = 3) -> List[float]:
+    """
+    returns: seconds per proof of each run verifying the whole corpus as
+    one batch
+    """
+    items = [(proof, V) for proof, V, _ in corpus]
+    samples = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ok = RangeProof(bitlength, m).verify_batch(items)
+        samples.append((time.perf_counter() - start) / len(items))
+
+        assert ok, 'Corpus failed batch verification'
+
+    return samples
+
+
+def run(bitlengths: List[int] = BITLENGTHS,
+        aggregation_sizes: List[int] = AGGREGATION_SIZES,
+        count: int = 16,
+        seed: int = 0,
+        save_corpus: Union[None, str] = None,
+        progress: Callable[[str, Dict], None] = None) -> Dict:
+    """
+    For every bitlength and aggregation size, reports (in seconds):
+
+    e2e.prove/<bitlength>x<m>: prover latency
+    e2e.verify/<bitlength>x<m>: single proof verification latency
+    e2e.verify_batch/<bitlength>x<m>: batch verification time per proof,
+    with the throughput in proofs_per_sec
+
+    `save_corpus` is a path prefix the corpora are archived under,
+    as <prefix><bitlength>x<m>.pybp
+
+    returns: {'meta': ..., 'results': {name: statistics}}
+    """
+    results: Dict[str, Dict] = {}
+
+    for m in aggregation_sizes:
+        for bitlength in bitlengths:
+            key = '{}x{}'.format(bitlength, m)
+
+            # Generators, the G table and the proof context are built
+            # outside the timings
+            get_generators(bitlength * m)
+            getNUMS(255)
+            B.get_G_table()
+            get_context(bitlength, m).get_H_tables()
+
+            corpus, prove = build_corpus(bitlength, m, count, seed)
+            verify = time_verify(bitlength, m, corpus)
+            batch = time_verify_batch(bitlength, m, corpus)
+
+            rows = {
+                'e2e.prove/' + key: summarize(prove),
+                'e2e.verify/' + key: summarize(verify),
+                'e2e.verify_batch/' + key: dict(
+                    summarize(batch), batch_size=count,
+                    proofs_per_sec=1 / min(batch))
+            }
+            for row in rows.values():
+                row['proof_bytes'] = len(corpus[0][0].to_bytes())
+
+            for name, row in rows.items():
+                results[name] = row
+                if progress is not None:
+                    progress(name, row)
+
+            if save_corpus is not None:
+                path = '{}{}.pybp'.format(save_corpus, key)
+                if os.path.exists(path):
+                    os.unlink(path)
+                with ArchiveWriter(path, bitlength, m) as archive:
+                    for proof, V, _ in corpus:
+                        archive.append(proof, V)
+
+    meta = dict(get_metadata(), suite='e2e', seed=seed, count=count)
+    return {'meta': meta, 'results': results}
@@ -0,0 +1,178 @@
+"""
+Microbenchmarks of the primitives the proofs are built from: point
+arithmetic, multi-scalar multiplication, scalar inversion, Vector
+kernels, NUMS derivation and transcript hashing
+"""
+import re
+import random
+import hashlib
+
+import pybitcointools as B
+
+from typing import Callable, Dict, List, Tuple, Union
+
+from pybp.bench import get_metadata, measure
+from pybp.types import Point, Scalar
+from pybp.utils import Transcript, derive_nums, getNUMS, get_generators, modinv
+from pybp.vectors import Vector
+
+MSM_SIZES = [4, 16, 64, 256]
+VECTOR_SIZES = [8, 64, 512, 4096]
+TRANSCRIPT_SIZES = [2, 64]
+
+# Deterministic inputs, so runs are comparable
+_rng = random.Random(1066)
+
+
+def random_scalar() -> int:
+    return _rng.randrange(1, B.N)
+
+
+def random_jacobian() -> Tuple[int, int, int]:
+    return B.jacobian_multiply(B.to_jacobian(B.G), random_scalar())
+
+
+def random_vector(n: int) -> Vector:
+    return Vector([random_scalar() for _ in range(n)])
+
+
+def bench_ec() -> List[Tuple[str, Callable]]:
+    p = random_jacobian()
+    q = random_jacobian()
+    k = random_scalar()
+
+    points = [random_jacobian() for _ in range(max(MSM_SIZES))]
+    scalars = [random_scalar() for _ in range(max(MSM_SIZES))]
+
+    benches = [
+        ('ec.jacobian_add', lambda: B.jacobian_add(p, q)),
+        ('ec.jacobian_double', lambda: B.jacobian_double(p)),
+        ('ec.jacobian_multiply', lambda: B.jacobian_multiply(p, k)),
+        ('ec.jacobian_multiply_G', lambda: B.jacobian_multiply(B.to_jacobian(B.G), k)),
+        ('ec.batch_to_affine/64', lambda: B.batch_to_affine(points[:64]))
+    ]
+
+    for n in MSM_SIZES:
+        benches.append(('ec.multiexp/{}'.format(n),
+                        lambda n=n: B.jacobian_multiexp(points[:n], scalars[:n])))
+
+    return benches
+
+
+def bench_scalar() -> List[Tuple[str, Callable]]:
+    k = random_scalar()
+
+    return [
+        ('scalar.modinv', lambda: modinv(k, B.N)),
+        ('scalar.inv', lambda: B.inv(k, B.N)),
+        ('scalar.pow', lambda: pow(k, 2 ** 64 - 1, B.N))
+    ]
+
+
+def bench_vector() -> List[Tuple[str, Callable]]:
+    benches = []
+    k = random_scalar()
+
+    for n in VECTOR_SIZES:
+        a = random_vector(n)
+        b = random_vector(n)
+        c = random_vector(n)
+
+        benches += [
+            ('vector.add/{}'.format(n), lambda a=a, b=b: a.add(b)),
+            ('vector.hadamard/{}'.format(n), lambda a=a, b=b: a.hadamard(b)),
+            ('vector.scale/{}'.format(n), lambda a=a: a.scale(k)),
+            ('vector.fold/{}'.format(n), lambda a=a: a.fold(k, k + 1)),
+            ('vector.inner_product/{}'.format(n), lambda a=a, b=b: a @ b),
+            ('vector.fused/{}'.format(n),
+             lambda a=a, b=b, c=c: ((a * (b + c)) + c * k).materialize()),
+            ('vector.operate/{}'.format(n),
+             lambda a=a, b=b: a.operate(lambda i, x: x * b.vals[i]))
+        ]
+
+    return benches
+
+
+def bench_nums() -> List[Tuple[str, Callable]]:
+    getNUMS(1)
+    get_generators(64)
+
+    return [
+        ('nums.derive_nums', lambda: derive_nums(1)),
+        ('nums.getNUMS', lambda: getNUMS(1)),
+        ('nums.get_generators/64', lambda: get_generators(64))
+    ]
+
+
+def fiat_shamir(fs_state: bytes,
+                data: Union[List[Point], List[Scalar]],
+                nret=2) -> Tuple[bytes, List[Scalar]]:
+    """
+    The challenge derivation the proofs used before `Transcript`,
+    rehashing the whole state for every batch of challenges; kept as
+    the baseline of the transcript benchmarks
+    """
+    # Point type
+    if isinstance(data[0], tuple):
+        data_bs: bytes = b''.join(B.encode_pubkey(x, 'bin') for x in data)
+
+    # Scalar type
+    elif isinstance(data[0], int):
+        data_bs: bytes = b''.join(B.encode_privkey(x, 'bin') for x in data)
+
+    else:
+        raise Exception('Invalid `data` param type for fiat_shamir')
+
+    xb: bytes = hashlib.sha256(fs_state + data_bs).digest()
+
+    challenges: List[Scalar] = []
+
+    for _ in range(nret):
+        challenges.append(B.encode_privkey(xb, 'decimal'))
+        xb = hashlib.sha256(xb).digest()
+
+    return xb, challenges
+
+
+def bench_transcript() -> List[Tuple[str, Callable]]:
+    benches = []
+
+    for n in TRANSCRIPT_SIZES:
+        points = [B.from_jacobian(random_jacobian()) for _ in range(n)]
+
+        def transcript(points=points):
+            t = Transcript(b'bench')
+            t.append_points(points)
+            return t.challenge_scalar()
+
+        benches += [
+            ('transcript.points/{}'.format(n), transcript),
+            ('transcript.fiat_shamir/{}'.format(n),
+             lambda points=points: fiat_shamir(b'', points, nret=1))
+        ]
+
+    return benches
+
+
+SUITES = [bench_ec, bench_scalar, bench_vector, bench_nums, bench_transcript]
+
+
+def run(pattern: str = '', warmup: int = 2, repeat: int = 7, min_time: float = 0.02,
+        progress: Callable[[str, Dict], None] = None) -> Dict:
+    """
+    Runs every microbenchmark whose name matches the regex `pattern`
+
+    returns: {'meta': ..., 'results': {name: statistics}}
+    """
+    results: Dict[str, Dict] = {}
+
+    for suite in SUITES:
+        for name, fn in suite():
+            if not re.search(pattern, name):
+                continue
+
+            results[name] = measure(fn, warmup=warmup, repeat=repeat, min_time=min_time)
+            if progress is not None:
+                progress(name, results[name])
+
+    return {'meta': dict(get_metadata(), suite='micro'), 'results': results}
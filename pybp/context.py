@@ -0,0 +1,116 @@
+"""
+Challenge-independent data of range proofs, precomputed once per
+(bitlength, m) and shared by every prover and verifier of that size
+
+    ctx = get_context(64)
+    ctx.G, ctx.H, ctx.power_of_twos, ctx.get_hprime(yinv)
+"""
+import threading
+
+import pybitcointools as B
+
+from typing import Dict, List, Tuple, Union
+
+from pybp.types import Point, JacobianPoint, Scalar
+from pybp.utils import getNUMS, get_generators
+from pybp.vectors import Vector, to_powervector
+
+# Multiplications each H_i table is expected to serve. Tables are kept
+# for the life of the process and used by every proof of their size, so
+# the window is sized for heavy reuse
+H_TABLE_USES = 64
+H_TABLE_WINDOW = B.wnaf_window(H_TABLE_USES)
+
+
+class BulletproofContext:
+    """
+    Generators, their Jacobian forms and window tables, and the constant
+    vectors and scalars of a range proof over m values of `bitlength` bits.
+
+    Everything but the H_i tables is built in the constructor and never
+    modified afterwards, so one context can be shared between threads.
+    The tables are only needed by provers and are built on first use,
+    under the context's lock. Use `get_context` to share them per size.
+    """
+
+    def __init__(self, bitlength: int, m: int = 1):
+        self.bitlength = bitlength
+        self.m = m
+        self.size = bitlength * m
+
+        G, H = get_generators(self.size)
+        self.G: Tuple[Point, ...] = tuple(G)
+        self.H: Tuple[Point, ...] = tuple(H)
+        self.G_jacobian: Tuple[JacobianPoint, ...] = tuple(B.to_jacobian(g) for g in G)
+        self.H_jacobian: Tuple[JacobianPoint, ...] = tuple(B.to_jacobian(h) for h in H)
+
+        # Blinding generator of every commitment
+        self.h: Point = getNUMS(255)
+        self.h_jacobian: JacobianPoint = B.to_jacobian(self.h)
+
+        # Odd multiples of each H_i, which are multiplied by y^-i per proof,
+        # see `get_H_tables`
+        self.H_tables: Union[None, Tuple[List[JacobianPoint], ...]] = None
+        self.lock = threading.Lock()
+
+        # [G, h, G_1..G_nm, H_1..H_nm], the shared generators of batch verification
+        self.batch_generators: Tuple[JacobianPoint, ...] = \
+            (B.to_jacobian(B.G), self.h_jacobian) + self.G_jacobian + self.H_jacobian
+
+        self.zeros = Vector([0] * self.size)
+        self.ones = Vector([1] * self.size)
+        self.twos = Vector([2] * self.size)
+        self.power_of_twos: Vector = to_powervector(2, bitlength)
+
+        # <1^n, 2^n>
+        self.sum_twos: Scalar = 2 ** bitlength - 1
+
+    def get_H_tables(self) -> Tuple[List[JacobianPoint], ...]:
+        """
+        The window tables of the H_i, built on first use
+        """
+        if self.H_tables is None:
+            with self.lock:
+                if self.H_tables is None:
+                    self.H_tables = tuple(
+                        B.jacobian_wnaf_tables(self.H_jacobian, H_TABLE_WINDOW))
+
+        return self.H_tables
+
+    def get_hprime(self, yinv: Scalar) -> List[Point]:
+        """
+        H'_i = y^-i * H_i, from the precomputed tables
+        """
+        yinv_n = to_powervector(yinv, self.size)
+
+        return B.batch_to_affine([
+            B.jacobian_multiply_table(h, table, k, H_TABLE_WINDOW)
+            for h, table, k in zip(self.H_jacobian, self.get_H_tables(), yinv_n)
+        ])
+
+
+_CONTEXTS: Dict[Tuple[int, int], BulletproofContext] = {}
+_CONTEXTS_LOCK = threading.Lock()
+
+
+def get_context(bitlength: int, m: int = 1) -> BulletproofContext:
+    """
+    The shared context for (bitlength, m), built on first use
+    """
+    try:
+        return _CONTEXTS[(bitlength, m)]
+    except KeyError:
+        pass
+
+    with _CONTEXTS_LOCK:
+        if (bitlength, m) not in _CONTEXTS:
+            _CONTEXTS[(bitlength, m)] = BulletproofContext(bitlength, m)
+        return _CONTEXTS[(bitlength, m)]
+
+
+def clear_contexts():
+    """
+    Drops every cached context, e.g. after `change_curve`
+    """
+    with _CONTEXTS_LOCK:
+        _CONTEXTS.clear()
@@ -5,12 +5,17 @@ import pybitcointools as B
 from functools import reduce
 from typing import List, Tuple, Union
 
-from pybp.types import Point, Scalar
+from pybp.types import Point, JacobianPoint, Scalar
+from pybp.serialize import check_point
 from pybp.vectors import Vector
-from pybp.utils import getNUMS, split, modinv, fiat_shamir, bytes_to_xes
+from pybp.utils import getNUMS, get_generators, split, modinv, get_xes, as_jacobian, Transcript, \
+    MemoizedCommitment
 
+# Domain separator of transcripts started by a standalone inner product argument
+IPA_LABEL = b'pybp innerproduct'
 
-class InnerProductCommitment:
+
+class InnerProductCommitment(MemoizedCommitment):
     """
     P = a*G + b*H + <a, b>U
     Where * indicates a vector, and <,> an inner product
@@ -28,13 +33,20 @@ class InnerProductCommitment:
     U, is NUMS based points
     G, H are a list of NUMS based points
     P is the single-EC point commitment created
+
+    U, G and H may be given in affine or Jacobian coordinates
+
+    The commitment is memoized until one of a, b, c, G, H or U is
+    reassigned (mutating G or H in place is not detected)
     """
 
+    INPUTS = frozenset(['a', 'b', 'c', 'G', 'H', 'U', 'vlen'])
+
     def __init__(self, a: Vector, b: Vector,
                  c: Union[None, Scalar] = None,
-                 G: List[Point] = [],
-                 H: List[Point] = [],
-                 U: Union[None, Point] = None):
+                 G: List[Union[Point, JacobianPoint]] = [],
+                 H: List[Union[Point, JacobianPoint]] = [],
+                 U: Union[None, Point, JacobianPoint] = None):
         assert len(a) == len(b)
 
         self.a = a
@@ -43,48 +55,52 @@ class InnerProductCommitment:
 
         self.vlen = len(a)
 
+        default_G, default_H = get_generators(self.vlen) \
+            if len(G) == 0 or len(H) == 0 else ([], [])
+
         self.U = U if U is not None else getNUMS(0)
-        self.G = G if len(G) > 0 else [getNUMS(i + 1)
-                                       for i in range(self.vlen)]
-        self.H = H if len(H) > 0 else [getNUMS(i + 1)
-                                       for i in range(self.vlen, 2*self.vlen)]
+        self.G = G if len(G) > 0 else default_G
+        self.H = H if len(H) > 0 else default_H
 
         self.L = []
         self.R = []
 
-    def get_commitment(self) -> Point:
+    def compute_commitment(self) -> JacobianPoint:
         """
         Returns:
 
         c * U + v_1 * G_1 + v_2 * G_2 + ... + v_n * G_n +
         w_1 * H_1 + w_2 * H_2 + ... + w_n + H_n
         """
-        P = B.multiply(self.U, self.c)
-
-        for g_x, a_x in zip(self.G, self.a):
-            P = B.add_pubkeys(P, B.fast_multiply(g_x, a_x))
-
-        for h_x, b_x in zip(self.H, self.b):
-            P = B.add_pubkeys(P, B.fast_multiply(h_x, b_x))
+        return B.jacobian_multiexp(
+            [as_jacobian(p) for p in
+             [self.U] + list(self.G[:self.vlen]) + list(self.H[:self.vlen])],
+            [self.c] + list(self.a) + list(self.b)
+        )
 
-        return P
+    def generate_proof(self, transcript: Union[None, Transcript] = None
+                       ) -> Tuple[Scalar, Scalar, List[Point], List[Point]]:
+        """
+        `transcript` continues the transcript of an enclosing protocol,
+        which must already bind the commitment (as the range proof's
+        does). Otherwise a fresh transcript is started from the commitment
+        """
+        if transcript is None:
+            transcript = Transcript(IPA_LABEL)
+            transcript.append_point(self.get_commitment())
 
-    def generate_proof(self) -> Tuple[Scalar, Scalar, List[Point], List[Point]]:
-        self.fs_state = b''
+        self.transcript = transcript
         self.L = []
         self.R = []
 
-        P = self.get_commitment()
-
-        return self.get_proof_recursive(self.a, self.b, P,
+        return self.get_proof_recursive(self.a, self.b,
                                         self.G, self.H, self.vlen)
 
     def get_proof_recursive(self,
                             a: Vector,
                             b: Vector,
-                            P: Point,
-                            G: List[Point],
-                            H: List[Point],
+                            G: List[Union[Point, JacobianPoint]],
+                            H: List[Union[Point, JacobianPoint]],
                             N: int
                             ) -> Tuple[Scalar, Scalar, List[Point], List[Point]]:
         # Can't compress L and R no more
@@ -98,61 +114,84 @@ class InnerProductCommitment:
         gL, gR = split(G)
         hL, hR = split(H)
 
-        self.L.append(
+        L, R = B.batch_to_affine([
             InnerProductCommitment(
-                aL, bR, G=gR, H=hL, U=self.U).get_commitment()
-        )
-        self.R.append(
+                aL, bR, G=gR, H=hL, U=self.U).get_jacobian_commitment(),
             InnerProductCommitment(
-                aR, bL, G=gL, H=hR, U=self.U).get_commitment()
-        )
+                aR, bL, G=gL, H=hR, U=self.U).get_jacobian_commitment()
+        ])
+        self.L.append(L)
+        self.R.append(R)
 
-        (self.fs_state, _) = fiat_shamir(
-            self.fs_state, [self.L[-1], self.R[-1], P], nret=0)
-        (x, x_sq, xinv, x_sq_inv) = bytes_to_xes(self.fs_state)
+        self.transcript.append_points([L, R])
+        (x, x_sq, xinv, x_sq_inv) = get_xes(self.transcript.challenge_scalar())
 
         # Construct change of coordinates for base points, and for vector terms
-        gprime = []
-        hprime = []
-        aprime = []
-        bprime = []
-
-        for i in range(int(N / 2)):
-            gprime.append(
-                B.add_pubkeys(
-                    B.multiply(G[i], xinv),
-                    B.multiply(G[i + int(N / 2)], x)
-                )
-            )
-
-            hprime.append(
-                B.add_pubkeys(
-                    B.multiply(H[i], x),
-                    B.multiply(H[i + int(N / 2)], xinv)
-                )
-            )
-
-            aprime.append(
-                x * a[i] + xinv * a[i + int(N / 2)] % B.N
-            )
-
-            bprime.append(
-                (xinv * b[i]) + x * b[i + int(N / 2)] % B.N
-            )
-
-        p_prime = B.add_pubkeys(P, B.multiply(self.L[-1], x_sq))
-        p_prime = B.add(p_prime, B.multiply(self.R[-1], x_sq_inv))
+        gprime, hprime = fold_generators(G, H, x, xinv)
+        aprime = a.fold(x, xinv)
+        bprime = b.fold(xinv, x)
 
         return self.get_proof_recursive(
-            Vector(aprime),
-            Vector(bprime),
-            p_prime,
+            aprime,
+            bprime,
             gprime,
             hprime,
             int(N / 2)
         )
 
-    def verify_proof(self, a: Vector, b: Vector, P: Point, L: List[Point], R: List[Point]):
+    @staticmethod
+    def get_challenges(L: List[Point],
+                       R: List[Point],
+                       transcript: Transcript
+                       ) -> Tuple[List[Scalar], List[Scalar]]:
+        """
+        Replays the verifier's side of the transcript; the commitment is
+        not hashed per round, so it never needs to be folded
+
+        returns: (x_j challenges, their inverses)
+        """
+        xs = []
+        xinvs = []
+
+        for L_j, R_j in zip(L, R):
+            transcript.append_points([L_j, R_j])
+            (x, _, xinv, _) = get_xes(transcript.challenge_scalar())
+            xs.append(x)
+            xinvs.append(xinv)
+
+        return (xs, xinvs)
+
+    @staticmethod
+    def get_s_vector(xs: List[Scalar], xinvs: List[Scalar]) -> List[Scalar]:
+        """
+        Coefficients s_i such that after all rounds the folded generator is
+        G' = s_1*G_1 + ... + s_n*G_n
+
+        Round j splits on bit (k - 1 - j) of i, where the upper half picks
+        up x_j and the lower half xinv_j. So s_0 is the product of every
+        xinv_j, and setting the top bit p of i multiplies s_(i - 2^p) by
+        x_j^2 for the round j = k - 1 - p; n - 1 multiplications overall.
+        Swapping xs and xinvs gives the s_i^-1 coefficients for H'
+        """
+        k = len(xs)
+        x_sqs = [pow(x, 2, B.N) for x in xs]
+
+        s = [reduce(lambda acc, xinv: acc * xinv % B.N, xinvs, 1)]
+
+        for i in range(1, 2 ** k):
+            p = i.bit_length() - 1
+            s.append(s[i - (1 << p)] * x_sqs[k - 1 - p] % B.N)
+
+        return s
+
+    def verify_proof(self,
+                     a: Scalar,
+                     b: Scalar,
+                     P: Union[Point, JacobianPoint],
+                     L: List[Point],
+                     R: List[Point],
+                     recursive: bool = False,
+                     transcript: Union[None, Transcript] = None):
         """
         Given proof (a, b, L, R) and the original pedersen commitment P,
         validates the proof that the commitment is to vectors a*, b* whose
@@ -163,55 +202,80 @@ class InnerProductCommitment:
         the construct, so they can be dummy values as long as the length
         is correct
 
-        returns: Bool
-        """
-        self.verify_iter = 0
-        self.fs_state = b''
+        `transcript` must be in the state the prover's was in when
+        `generate_proof` was called with it; without one, a fresh
+        transcript is started from P
 
-        return self.verify_proof_recursive(P, L, R, a, b, self.G, self.H, self.vlen)
+        By default all log2(n) challenges are derived first and the folded
+        generators are expressed through the s_i coefficients, so the final
+        check is a single multi-scalar multiplication:
+            P + sum(x_j^2*L_j + x_j^-2*R_j)
+                == <a,b>U + sum(a*s_i*G_i) + sum(b*s_i^-1*H_i)
+        `recursive` selects the original round-by-round generator folding
+
+        returns: Bool, False too if P (when affine), L or R is not on the curve
+        """
+        if len(L) != len(R) or 2 ** len(L) != self.vlen:
+            return False
+
+        try:
+            for p in ([P] if len(P) == 2 else []) + list(L) + list(R):
+                check_point(p)
+        except (TypeError, ValueError):
+            return False
+
+        if transcript is None:
+            transcript = Transcript(IPA_LABEL)
+            transcript.append_point(
+                P if len(P) == 2 else B.from_jacobian(P))
+
+        if recursive:
+            self.verify_iter = 0
+            self.transcript = transcript
+
+            return self.verify_proof_recursive(P, L, R, a, b, self.G, self.H, self.vlen)
+
+        xs, xinvs = self.get_challenges(L, R, transcript)
+        s = self.get_s_vector(xs, xinvs)
+        s_inv = self.get_s_vector(xinvs, xs)
+
+        return B.jacobian_eq(
+            B.jacobian_multiexp(
+                [as_jacobian(P)] + [B.to_jacobian(p) for p in L + R],
+                [1] + [x * x for x in xs] + [xinv * xinv for xinv in xinvs]
+            ),
+            B.jacobian_multiexp(
+                [as_jacobian(p) for p in
+                 [self.U] + list(self.G[:self.vlen]) + list(self.H[:self.vlen])],
+                [a * b] + [a * s_i for s_i in s] + [b * s_i for s_i in s_inv]
+            )
+        )
 
     def verify_proof_recursive(self,
-                               P: Point,
+                               P: Union[Point, JacobianPoint],
                                L: Point,
                                R: Point,
                                a: Scalar,
                                b: Scalar,
-                               G: List[Point],
-                               H: List[Point],
+                               G: List[Union[Point, JacobianPoint]],
+                               H: List[Union[Point, JacobianPoint]],
                                N: int):
         if N == 1:
             p_prime = InnerProductCommitment(
-                Vector([a]), Vector([b]), G=G, H=H, U=self.U).get_commitment()
+                Vector([a]), Vector([b]), G=G, H=H, U=self.U).get_jacobian_commitment()
 
-            return P == p_prime
+            return B.jacobian_eq(as_jacobian(P), p_prime)
 
-        (self.fs_state, _) = fiat_shamir(self.fs_state, [
-            L[self.verify_iter], R[self.verify_iter], P], nret=0)
-        (x, x_sq, xinv, x_sq_inv) = bytes_to_xes(self.fs_state)
+        self.transcript.append_points([L[self.verify_iter], R[self.verify_iter]])
+        (x, x_sq, xinv, x_sq_inv) = get_xes(self.transcript.challenge_scalar())
 
-        gprime = []
-        hprime = []
+        gprime, hprime = fold_generators(G, H, x, xinv)
 
-        for i in range((int(N / 2))):
-            gprime.append(
-                B.add_pubkeys(
-                    B.multiply(G[i], xinv),
-                    B.multiply(G[i + int(N / 2)], x)
-                )
-            )
-
-            hprime.append(
-                B.add_pubkeys(
-                    B.multiply(H[i], x),
-                    B.multiply(H[i + int(N / 2)], xinv)
-                )
-            )
-
-        p_prime1 = B.add_pubkeys(
-            P, B.multiply(L[self.verify_iter], x_sq)
-        )
-        p_prime = B.add_pubkeys(
-            p_prime1, B.multiply(R[self.verify_iter], x_sq_inv)
+        p_prime = B.jacobian_multiexp(
+            [as_jacobian(P),
+             B.to_jacobian(L[self.verify_iter]),
+             B.to_jacobian(R[self.verify_iter])],
+            [1, x_sq, x_sq_inv]
         )
 
         self.verify_iter = self.verify_iter + 1
@@ -226,3 +290,41 @@ class InnerProductCommitment:
             hprime,
             int(N / 2)
         )
+
+
+def fold_generators(G: List[Union[Point, JacobianPoint]],
+                    H: List[Union[Point, JacobianPoint]],
+                    x: Scalar,
+                    xinv: Scalar
+                    ) -> Tuple[List[Point], List[Point]]:
+    """
+    Change of coordinates for the base points in one round:
+
+    G'_i = xinv * G_i + x * G_(i + n/2)
+    H'_i = x * H_i + xinv * H_(i + n/2)
+
+    The window tables of all 2n bases are built together, and all n
+    folded points normalized to affine together, each with a single
+    field inversion
+    """
+    half = int(len(G) / 2)
+
+    # Each base is multiplied exactly once
+    w = B.wnaf_window(1)
+    bases = [as_jacobian(p) for p in list(G) + list(H)]
+    tables = B.jacobian_wnaf_tables(bases, w)
+
+    def multiply(i: int, n: Scalar) -> JacobianPoint:
+        return B.jacobian_multiply_table(bases[i], tables[i], n, w)
+
+    folded = [
+        B.jacobian_add(multiply(i, xinv), multiply(i + half, x))
+        for i in range(half)
+    ] + [
+        B.jacobian_add(multiply(2 * half + i, x), multiply(3 * half + i, xinv))
+        for i in range(half)
+    ]
+
+    folded = B.batch_to_affine(folded)
+
+    return (folded[:half], folded[half:])
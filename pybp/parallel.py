@@ -0,0 +1,84 @@
+import os
+
+import pybitcointools as B
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from pybp.rangeproof import RangeProof
+from pybp.serialize import ProofView
+from pybp.types import Point, Scalar
+from pybp.utils import getNUMS, get_generators, get_nums_cache, seed_nums_cache
+
+
+def warm_worker(nums: Dict[int, Point], backend: str):
+    """
+    Process pool initializer: installs the parent's NUMS generators
+    and point arithmetic backend, and builds the fixed-base G table
+    before the first proof arrives
+    """
+    seed_nums_cache(nums)
+    B.set_backend(backend)
+    B.get_G_table()
+
+
+def prove(bitlength: int,
+          m: int,
+          values: Union[Scalar, List[Scalar]]
+          ) -> Tuple[bytes, Union[Point, List[Point]], Union[Scalar, List[Scalar]]]:
+    """
+    Generates a single range proof
+
+    returns: (proof encoded by RangeProof.to_bytes, V, gamma)
+    """
+    rp = RangeProof(bitlength, m)
+    rp.generate_proof(values)
+
+    return (rp.to_bytes(), rp.V, rp.gamma)
+
+
+def as_view(result: Tuple[bytes, Union[Point, List[Point]], Union[Scalar, List[Scalar]]]
+            ) -> Tuple[ProofView, Union[Point, List[Point]], Union[Scalar, List[Scalar]]]:
+    proof, V, gamma = result
+    return (ProofView(proof), V, gamma)
+
+
+def prove_many(values: Iterable[Union[Scalar, List[Scalar]]],
+               bitlength: int,
+               m: int = 1,
+               workers: Union[None, int] = None,
+               window: Union[None, int] = None
+               ) -> Iterator[Tuple[ProofView, Union[Point, List[Point]], Union[Scalar, List[Scalar]]]]:
+    """
+    Generates range proofs for `values` on a pool of `workers` processes
+    (defaults to the number of CPUs), each element being a value or, for
+    m > 1, a list of m values.
+
+    Proofs are yielded in input order as (proof, V, gamma) as soon as
+    they and all proofs before them are done. Workers send proofs back
+    in their binary encoding; the proof is a `ProofView` over it, which
+    can be used as the proof dict or turned back into bytes. At most `window`
+    (defaults to 2 * workers) proofs are in flight, so `values` is
+    consumed lazily and a slow consumer holds back the producers.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = window or 2 * workers
+
+    # Derive the generators once here rather than in every worker
+    get_generators(bitlength * m)
+    getNUMS(0)
+    getNUMS(255)
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=warm_worker,
+                             initargs=(get_nums_cache(), B.get_backend())) as executor:
+        pending = deque()
+
+        for value in values:
+            if len(pending) >= window:
+                yield as_view(pending.popleft().result())
+            pending.append(executor.submit(prove, bitlength, m, value))
+
+        while pending:
+            yield as_view(pending.popleft().result())
@@ -4,11 +4,20 @@ import pybp
 import pybitcointools as B
 
 from typing import Union
-from pybp.utils import get_blinding_value, getNUMS
-from pybp.types import Scalar, Point
+from pybp.utils import get_blinding_value, getNUMS, MemoizedCommitment
+from pybp.types import Scalar, Point, JacobianPoint
 
 
-class PedersonCommitment:
+class PedersonCommitment(MemoizedCommitment):
+    """
+    v * G + b * H
+
+    The commitment is memoized, and recomputed only once one of
+    g, h, v or b is reassigned
+    """
+
+    INPUTS = frozenset(['g', 'h', 'v', 'b'])
+
     def __init__(self, v: Scalar, b: Union[None, Scalar] = None, h: Point = getNUMS(255)):
         self.g: Point = B.getG()
         self.h: Point = h
@@ -19,8 +28,8 @@ class PedersonCommitment:
         # Blinding Factor
         self.b: Scalar = b if isinstance(b, int) else get_blinding_value()
 
-    def get_commitment(self) -> Point:
-        Hb = B.multiply(self.h, self.b)
-        Gv = B.multiply(self.g, self.v)
+    def compute_commitment(self) -> JacobianPoint:
+        Hb = B.jacobian_multiply(B.to_jacobian(self.h), self.b)
+        Gv = B.jacobian_multiply(B.to_jacobian(self.g), self.v)
 
-        return B.add(Hb, Gv)
+        return B.jacobian_add(Hb, Gv)
@@ -1,166 +1,350 @@
 import os
+import random
 import hashlib
+import secrets
 
 import pybitcointools as B
 
-from functools import reduce
-from typing import List, Union, Dict
+from typing import Callable, List, Tuple, Union, Dict
 
-from pybp.utils import get_blinding_value, get_blinding_vector, getNUMS, modinv, fiat_shamir
+from pybp.utils import get_blinding_value, get_blinding_vector, modinv, Transcript
 from pybp.pederson import PedersonCommitment
-from pybp.types import Scalar, Point
+from pybp.types import Scalar, Point, JacobianPoint
 from pybp.vectors import Vector, to_bitvector, to_powervector
 from pybp.innerproduct import InnerProductCommitment
+from pybp.serialize import ProofView, check_point, proof_to_bytes
+from pybp.context import BulletproofContext, get_context
+from pybp import tracing
+
+# Domain separator of range proof transcripts
+RANGEPROOF_LABEL = b'pybp rangeproof'
+
+# Supported bit lengths of the proven values
+BITLENGTHS = [2, 4, 8, 16, 32, 64]
+
+# Prover self-check modes, see ValidationPolicy
+VALIDATE_NONE = 'none'
+VALIDATE_CHEAP = 'cheap'
+VALIDATE_FULL = 'full'
+
+
+class ProverCheckFailed(AssertionError):
+    """
+    A prover self-check failed. `check` names it ('range', 'bits',
+    'value', 't' or 'self_verify') and `details` holds the context
+    """
+
+    def __init__(self, check: str, message: str, **details):
+        super().__init__('{} check failed: {}'.format(check, message))
+        self.check = check
+        self.message = message
+        self.details = details
+
+
+class ValidationPolicy:
+    """
+    Which self-checks the prover runs on the proofs it generates:
+
+    none: only that the values are in range
+    cheap: also the algebraic checks, aL * aR = 0, <aL_j, 2^n> = v_j
+    and t = <l(x), r(x)>, which are linear in the bitlength
+    full: the cheap checks, and verifying the inner product argument
+    on a `sample_rate` fraction of proofs
+    """
+    __slots__ = ('mode', 'sample_rate')
+
+    def __init__(self, mode: str = VALIDATE_FULL, sample_rate: float = 1.0):
+        if mode not in (VALIDATE_NONE, VALIDATE_CHEAP, VALIDATE_FULL):
+            raise Exception('Unknown validation mode {}'.format(mode))
+        if not 0 <= sample_rate <= 1:
+            raise Exception('Sample rate must be in [0, 1]')
+
+        self.mode = mode
+        self.sample_rate = sample_rate
+
+    @property
+    def cheap_checks(self) -> bool:
+        return self.mode != VALIDATE_NONE
+
+    def sample_self_verify(self) -> bool:
+        """
+        Whether to fully verify the next proof
+        """
+        if self.mode != VALIDATE_FULL:
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __repr__(self):
+        return 'ValidationPolicy({!r}, sample_rate={})'.format(self.mode, self.sample_rate)
+
+
+_default_validation = ValidationPolicy()
+
+
+def set_validation_policy(policy: Union[None, ValidationPolicy] = None):
+    """
+    Sets the policy of provers constructed without one, e.g.
+    `ValidationPolicy('full', 0.01)` in production. `None` restores
+    full checks on every proof
+    """
+    global _default_validation
+    _default_validation = policy if policy is not None else ValidationPolicy()
+
+
+def get_validation_policy() -> ValidationPolicy:
+    return _default_validation
+
+
+def get_batch_weight() -> Scalar:
+    """
+    Random weight of an equation in batch verification. Always drawn from
+    the OS, as predictable weights would let invalid proofs cancel out
+    """
+    return secrets.randbelow(B.N - 1) + 1
 
 
 class RangeProof:
     """
     Based on Bulletproof paper: https://eprint.iacr.org/2017/1066.pdf
+
+    Proves that each of m values lies in [0, 2^bitlength), with m > 1
+    aggregating them into a single proof as in section 4.3
     """
 
-    def __init__(self, bitlength):
-        assert bitlength in [2, 4, 8, 16, 32,
-                             64], "Bitlength must be power of 2 <= 64"
+    def __init__(self, bitlength, m=1,
+                 validation: Union[None, ValidationPolicy] = None,
+                 randbytes: Callable[[int], bytes] = os.urandom):
+        """
+        validation: the prover's self-checks, defaulting to the policy
+        set by `set_validation_policy`
+
+        randbytes: source of the prover's blinding values. A seeded
+        source such as `random.Random(seed).randbytes` makes proofs
+        reproducible for benchmarking, but they then no longer hide
+        their values
+        """
+        assert bitlength in BITLENGTHS, "Bitlength must be power of 2 <= 64"
+        assert m > 0 and m & (m - 1) == 0, "Aggregation size must be power of 2"
         self.bitlength = bitlength
+        self.m = m
+
+        # Length of the concatenated bit vectors, and so of the inner product
+        self.size = bitlength * m
 
-    def generate_proof(self, value: Scalar):
+        self.validation = validation
+        self.randbytes = randbytes
+
+        # Generators and constants shared by every proof of this size
+        self.context: BulletproofContext = get_context(bitlength, m)
+
+    def get_z22n(self, z: Scalar) -> Vector:
         """
-        Given a value, follow the algorithm laid out
-        on p.16, 17 (section 4.2) of paper for prover side
+        z^2 * 2^n || z^3 * 2^n || ... || z^(m+1) * 2^n, the weighted
+        powers of two which tie block j of the bit vector to V_j
         """
-        fs_state = b''
+        power_of_twos = self.context.power_of_twos
 
-        # Vector of all 1's or 0's
-        # Mainly for readability
-        zeros = Vector([0] * self.bitlength)
-        ones = Vector([1] * self.bitlength)
-        twos = Vector([2] * self.bitlength)
-        power_of_twos = to_powervector(2, self.bitlength)
-
-        aL = to_bitvector(value, self.bitlength)
-        aR = aL - ones
-
-        assert aL * aR == zeros
-        assert aL @ power_of_twos == value
-
-        # Pederson Commitment to fulfill the hiding and binding properties
-        # of bulletproof. Binding value is automatically created
-        gamma = get_blinding_value()
-        pc = PedersonCommitment(value, b=gamma)
-        V: Point = pc.get_commitment()
-
-        alpha: Scalar = get_blinding_value()
-        A = InnerProductCommitment(aL, aR, c=alpha, U=getNUMS(255))
-        P_a: Point = A.get_commitment()
-
-        sL = get_blinding_vector(self.bitlength)
-        sR = get_blinding_vector(self.bitlength)
-        rho = get_blinding_value()
-
-        S = InnerProductCommitment(sL, sR, c=rho, U=getNUMS(255))
-        P_s: Point = S.get_commitment()
-
-        fs_state, fs_challanges = fiat_shamir(fs_state, [V, P_a, P_s])
-        y: Point = fs_challanges[0]
-        z: Point = fs_challanges[1]
-
-        z2 = pow(z, 2, B.N)
-        zv = Vector([z] * self.bitlength)
-
-        # Construct l(x) and r(x) coefficients;
-        # l[0] = constant term
-        # l[1] = linear term
-        # same for r(x)
-        l: List[Vector] = [
-            aL - zv,
-            sL
-        ]
-        yn: Vector = to_powervector(y, self.bitlength)
-
-        # 0th coeff is y^n ⋅ (aR + z ⋅ 1^n) + (z^2 ⋅ 2^n)
-        # operators have been overloaded, so all good
-        r: List[Vector] = [
-            # operator overloading works if vector is first
-            (yn * (aR + zv)) + (power_of_twos * z2),
-            yn * sR
-        ]
-
-        # Constant term of t(x) = <l(x), r(x)> is the inner product
-        # of the constant terms of l(x)and r(x)
-        t0: Scalar = l[0] @ r[0]
-        t2: Scalar = l[1] @ r[1]
-        t1: Scalar = (((l[0] + l[1]) @ (r[0] + r[1])) - t0 - t2) % B.N
-
-        tau1 = get_blinding_value()
-        T1 = PedersonCommitment(t1, b=tau1)
-
-        tau2 = get_blinding_value()
-        T2 = PedersonCommitment(t2, b=tau2)
-
-        fs_state, fs_challanges = fiat_shamir(
-            fs_state, [T1.get_commitment(), T2.get_commitment()], nret=1
-        )
-        x_1: Scalar = fs_challanges[0]
-        mu = (alpha + rho * x_1) % B.N
-        tau_x = (z2 * gamma + tau1 * x_1 + tau2 * x_1 * x_1) % B.N
+        return Vector([
+            pow(z, 2 + j, B.N) * power_of_twos[i]
+            for j in range(self.m) for i in range(self.bitlength)
+        ])
+
+    def get_gexp(self, y: Scalar, z: Scalar) -> Scalar:
+        """
+        delta(y, z) = (z - z^2) * <1^nm, y^nm> - sum(z^(j+3) * <1^n, 2^n>)
+        """
+        # <1^nm, y^nm> is a geometric series
+        sum_yn = (pow(y, self.size, B.N) - 1) * modinv(y - 1, B.N) % B.N \
+            if y != 1 else self.size
 
-        # lx and rx are vetor-value first degree polynomials evaluated at
-        # the challenge value x_1
-        lx: Vector = l[0] + (l[1] * x_1)
-        rx: Vector = r[0] + (r[1] * x_1)
-        t: Scalar = (t0 + t1 * x_1 + t2 * x_1 * x_1) % B.N
+        k: Scalar = (sum_yn * (-pow(z, 2, B.N))) % B.N
+        for j in range(self.m):
+            k = (k - self.context.sum_twos * pow(z, 3 + j, B.N)) % B.N
 
-        assert t == lx @ rx
+        return (k + z * sum_yn) % B.N
 
-        # Prover can new send tau_x, mu and t to verifier
-        # inner product argument can be verified from this data
-        hprime = []
-        yinv = modinv(y, B.N)
+    def generate_proof(self, values: Union[Scalar, List[Scalar]]):
+        """
+        Given a value (or m values), follow the algorithm laid out
+        on p.16, 17 (section 4.2) of paper for prover side, aggregated
+        as in section 4.3
+        """
+        with self.span('prove'):
+            self._generate_proof(values)
 
-        for i in range(self.bitlength):
-            hprime.append(
-                B.multiply(A.H[i], pow(yinv, i, B.N))
-            )
+    def _generate_proof(self, values: Union[Scalar, List[Scalar]]):
+        transcript = self.start_transcript()
+
+        if isinstance(values, int):
+            values = [values]
+        assert len(values) == self.m, "Expected {} values".format(self.m)
 
-        fs_state, fs_challanges = fiat_shamir(fs_state, [tau_x, mu, t], nret=1)
-        uchallenge = fs_challanges[0]
-        
-        U = B.multiply(B.G, uchallenge)
+        policy = self.validation if self.validation is not None else _default_validation
 
-        # On the prover side, need to construct an inner product argument
-        iproof = InnerProductCommitment(lx, rx, U=U, H=hprime)
-        proof = iproof.generate_proof()
+        for j, value in enumerate(values):
+            if not 0 <= value < 2 ** self.bitlength:
+                raise ProverCheckFailed(
+                    'range', 'value {} is not in [0, 2^{})'.format(j, self.bitlength),
+                    index=j, bitlength=self.bitlength)
+
+        # Vector of all 1's or 0's
+        # Mainly for readability
+        ctx = self.context
+        zeros = ctx.zeros
+        ones = ctx.ones
+        twos = ctx.twos
+        power_of_twos = ctx.power_of_twos
+
+        with self.span('prove.bits'):
+            # Bits of every value, concatenated
+            aL = Vector([
+                bit for value in values
+                for bit in to_bitvector(value, self.bitlength)
+            ])
+            aR = aL - ones
+
+            if policy.cheap_checks:
+                if aL * aR != zeros:
+                    raise ProverCheckFailed('bits', 'aL * aR != 0')
+                for j, value in enumerate(values):
+                    if aL[j * self.bitlength:(j + 1) * self.bitlength] @ power_of_twos != value:
+                        raise ProverCheckFailed(
+                            'value', '<aL_{}, 2^n> != v_{}'.format(j, j), index=j)
+
+        with self.span('prove.commit_as'):
+            # Pederson Commitment to fulfill the hiding and binding properties
+            # of bulletproof. Binding value is automatically created
+            gammas = [get_blinding_value(self.randbytes) for _ in values]
+            V: List[Point] = [
+                PedersonCommitment(value, b=gamma).get_commitment()
+                for value, gamma in zip(values, gammas)
+            ]
+
+            G, H = ctx.G_jacobian, ctx.H_jacobian
+
+            alpha: Scalar = get_blinding_value(self.randbytes)
+            A = InnerProductCommitment(aL, aR, c=alpha, G=G, H=H, U=ctx.h_jacobian)
+            P_a: Point = A.get_commitment()
+
+            sL = get_blinding_vector(self.size, self.randbytes)
+            sR = get_blinding_vector(self.size, self.randbytes)
+            rho = get_blinding_value(self.randbytes)
+
+            S = InnerProductCommitment(sL, sR, c=rho, G=G, H=H, U=ctx.h_jacobian)
+            P_s: Point = S.get_commitment()
+
+        with self.span('prove.challenge_yz'):
+            transcript.append_points(V + [P_a, P_s])
+            y: Scalar = transcript.challenge_scalar()
+            z: Scalar = transcript.challenge_scalar()
+
+        with self.span('prove.t_coefficients'):
+            zv = Vector([z] * self.size)
+
+            # Construct l(x) and r(x) coefficients;
+            # l[0] = constant term
+            # l[1] = linear term
+            # same for r(x)
+            l: List[Vector] = [
+                aL - zv,
+                sL
+            ]
+            yn: Vector = to_powervector(y, self.size)
+
+            # 0th coeff is y^nm ⋅ (aR + z ⋅ 1^nm) + sum(z^(1+j) ⋅ (0^(j-1)n || 2^n || 0^(m-j)n))
+            # operators have been overloaded, so all good
+            r: List[Vector] = [
+                # operator overloading works if vector is first
+                (yn * (aR + zv)) + self.get_z22n(z),
+                yn * sR
+            ]
+
+            # Constant term of t(x) = <l(x), r(x)> is the inner product
+            # of the constant terms of l(x)and r(x)
+            t0: Scalar = l[0] @ r[0]
+            t2: Scalar = l[1] @ r[1]
+            t1: Scalar = (((l[0] + l[1]) @ (r[0] + r[1])) - t0 - t2) % B.N
+
+        with self.span('prove.commit_t'):
+            tau1 = get_blinding_value(self.randbytes)
+            T1 = PedersonCommitment(t1, b=tau1)
+
+            tau2 = get_blinding_value(self.randbytes)
+            T2 = PedersonCommitment(t2, b=tau2)
+
+            T1p: Point = T1.get_commitment()
+            T2p: Point = T2.get_commitment()
+
+            transcript.append_points([T1p, T2p])
+            x_1: Scalar = transcript.challenge_scalar()
+            mu = (alpha + rho * x_1) % B.N
+            tau_x = (tau1 * x_1 + tau2 * x_1 * x_1) % B.N
+            for j, gamma in enumerate(gammas):
+                tau_x = (tau_x + pow(z, 2 + j, B.N) * gamma) % B.N
+
+            # lx and rx are vetor-value first degree polynomials evaluated at
+            # the challenge value x_1
+            lx: Vector = l[0] + (l[1] * x_1)
+            rx: Vector = r[0] + (r[1] * x_1)
+            t: Scalar = (t0 + t1 * x_1 + t2 * x_1 * x_1) % B.N
+
+            if policy.cheap_checks and t != lx @ rx:
+                raise ProverCheckFailed('t', 't != <l(x), r(x)>')
+
+        with self.span('prove.hprime'):
+            # Prover can new send tau_x, mu and t to verifier
+            # inner product argument can be verified from this data
+            hprime: List[Point] = ctx.get_hprime(modinv(y, B.N))
+
+        with self.span('prove.ipa'):
+            transcript.append_scalars([tau_x, mu, t])
+            uchallenge = transcript.challenge_scalar()
+
+            U: JacobianPoint = B.jacobian_multiply(B.to_jacobian(B.G), uchallenge)
+
+            # On the prover side, need to construct an inner product argument,
+            # continuing the transcript (which already binds its commitment)
+            ipa_transcript = transcript.clone()
+            iproof = InnerProductCommitment(lx, rx, U=U, G=G, H=hprime)
+            proof = iproof.generate_proof(transcript)
 
         ak: Scalar = proof[0]
         bk: Scalar = proof[1]
         lk: List[Point] = proof[2]
         rk: List[Point] = proof[3]
 
-        # At this point we have a valid data set, but here is included a
-        # sanity check that the inner product proof we've generated actually verifies
-        iproof2 = InnerProductCommitment(ones, twos, H=hprime, U=U)
+        if policy.sample_self_verify():
+            with self.span('prove.self_check'):
+                # At this point we have a valid data set, but here is included a
+                # sanity check that the inner product proof we've generated actually verifies
+                iproof2 = InnerProductCommitment(ones, twos, G=G, H=hprime, U=U)
 
-        assert iproof2.verify_proof(ak, bk, iproof.get_commitment(), lk, rk)
+                if not iproof2.verify_proof(ak, bk, iproof.get_jacobian_commitment(), lk, rk,
+                                            transcript=ipa_transcript):
+                    raise ProverCheckFailed('self_verify', 'inner product argument does not verify',
+                                            rounds=len(lk))
 
+        # A single value keeps its commitment and blinding value as
+        # a point and scalar, m values as lists of them
         self.proof = proof
         self.tau_x = tau_x
-        self.gamma = gamma
+        self.gamma = gammas[0] if self.m == 1 else gammas
         self.mu = mu
-        self.T1 = T1
-        self.T2 = T2
-        self.A = A
-        self.S = S
+        self.Ap = P_a
+        self.Sp = P_s
+        self.T1p = T1p
+        self.T2p = T2p
         self.t = t
-        self.V = V
+        self.V = V[0] if self.m == 1 else V
 
     def get_proof_dict(self) -> Dict:
         """
         Returns the rangeproof that's been created in dictionary format.
         And all scalars are fixed length 32 bytes, including the (a, b)
         components of the inner pdocut proof. The exception is L, R which are
-        arrays of EC points, length log_2(bitlength).
+        arrays of EC points, length log_2(bitlength * m).
 
-        So total size of proof is 33*4 + 32*3 + (32*2 + 33*2*log_2(bitlength)).
+        So total size of proof is 33*4 + 32*3 + (32*2 + 33*2*log_2(bitlength * m)).
         This agrees with the last sentence of 4.2 in the paper
         """
 
@@ -169,103 +353,284 @@ class RangeProof:
             't': self.t,
             'mu': self.mu,
             'tau_x': self.tau_x,
-            'Ap': self.A.get_commitment(),
-            'Sp': self.S.get_commitment(),
-            'T1p': self.T1.get_commitment(),
-            'T2p': self.T2.get_commitment()
+            'Ap': self.Ap,
+            'Sp': self.Sp,
+            'T1p': self.T1p,
+            'T2p': self.T2p
         }
 
-    def verify(self, Ap, Sp, T1p, T2p, tau_x, mu, t, proof, V):
-        fs_state = b''
+    def to_bytes(self) -> bytes:
+        """
+        The proof from `get_proof_dict` in its canonical binary encoding,
+        see `pybp.serialize.proof_to_bytes`
+        """
+        return proof_to_bytes(self.get_proof_dict())
 
-        # Compute challenges to find x, y, z
-        fs_state, fs_challenge = fiat_shamir(fs_state, [V, Ap, Sp])
-        y: Scalar = fs_challenge[0]
-        z: Scalar = fs_challenge[1]
-        z2 = pow(z, 2, B.N)
+    @staticmethod
+    def from_bytes(buf) -> ProofView:
+        """
+        Parses an encoded proof from any buffer without copying it.
+        The returned view can be used in place of the proof dict, e.g.
+        `verify(V=V, **RangeProof.from_bytes(buf))`
+        """
+        return ProofView(buf)
 
-        fs_state, fs_challenge = fiat_shamir(fs_state, [T1p, T2p], nret=1)
-        x_1 = fs_challenge[0]
+    def start_transcript(self) -> Transcript:
+        """
+        Transcript for a proof of this bitlength and aggregation size
+        """
+        transcript = Transcript(RANGEPROOF_LABEL)
+        transcript.append_scalars([self.bitlength, self.m])
+        return transcript
 
-        # Construct verification equation (61)
-        power_of_ones = to_powervector(1, self.bitlength)
-        power_of_twos = to_powervector(2, self.bitlength)
-        yn = to_powervector(y, self.bitlength)
+    def replay_transcript(self, V, Ap, Sp, T1p, T2p, tau_x, mu, t
+                          ) -> Tuple[Transcript, Scalar, Scalar, Scalar, Scalar]:
+        """
+        The verifier's side of the transcript up to the inner product
+        argument
 
-        k: Scalar = ((yn @ power_of_ones) * (-z2)) % B.N
-        k = (k - (power_of_ones @ power_of_twos) * pow(z, 3, B.N)) % B.N
+        returns: (transcript, y, z, x, u)
+        """
+        transcript = self.start_transcript()
 
-        gexp: Scalar = (k + z * (power_of_ones @ yn)) % B.N
+        transcript.append_points(V + [Ap, Sp])
+        y: Scalar = transcript.challenge_scalar()
+        z: Scalar = transcript.challenge_scalar()
 
-        lhs = PedersonCommitment(t, b=tau_x).get_commitment()
+        transcript.append_points([T1p, T2p])
+        x_1: Scalar = transcript.challenge_scalar()
 
-        rhs = B.multiply(B.G, gexp)
-        rhs = B.add_pubkeys(rhs, B.multiply(V, z2))
-        rhs = B.add_pubkeys(rhs, B.multiply(T1p, x_1))
-        rhs = B.add_pubkeys(rhs, B.multiply(T2p, pow(x_1, 2, B.N)))
+        transcript.append_scalars([tau_x, mu, t])
+        uchallenge: Scalar = transcript.challenge_scalar()
 
-        if not lhs == rhs:
-            print('(61) verification check failed')
+        return (transcript, y, z, x_1, uchallenge)
+
+    def verify(self, Ap, Sp, T1p, T2p, tau_x, mu, t, proof, V):
+        """
+        V is the commitment to the value, or the list of m commitments
+        for an aggregated proof
+        """
+        with self.span('verify'):
+            return self._verify(Ap, Sp, T1p, T2p, tau_x, mu, t, proof, V)
+
+    def _verify(self, Ap, Sp, T1p, T2p, tau_x, mu, t, proof, V):
+        try:
+            V = self.as_commitment_list(V)
+        except ValueError:
             return False
 
-        # HPrime
-        hprime = []
-        yinv = modinv(y, B.N)
+        if len(V) != self.m:
+            return False
 
-        for i in range(1, self.bitlength + 1):
-            hprime.append(
-                B.multiply(getNUMS(self.bitlength + i), pow(yinv, i-1, B.N))
+        try:
+            self.check_points(V, Ap, Sp, T1p, T2p, proof)
+        except ValueError:
+            return False
+
+        with self.span('verify.challenges'):
+            # Compute challenges to find x, y, z
+            transcript, y, z, x_1, uchallenge = self.replay_transcript(
+                V, Ap, Sp, T1p, T2p, tau_x, mu, t)
+
+        with self.span('verify.check_61'):
+            # Construct verification equation (61)
+            gexp: Scalar = self.get_gexp(y, z)
+
+            lhs = PedersonCommitment(t, b=tau_x).get_jacobian_commitment()
+
+            rhs = B.jacobian_add(
+                B.jacobian_multiply(B.to_jacobian(B.G), gexp),
+                B.jacobian_multiexp(
+                    [B.to_jacobian(V_j) for V_j in V] +
+                    [B.to_jacobian(T1p), B.to_jacobian(T2p)],
+                    [pow(z, 2 + j, B.N) for j in range(self.m)] +
+                    [x_1, pow(x_1, 2, B.N)]
+                )
             )
 
-        # Reconstruct P
-        P = B.add_pubkeys(
-            B.multiply(Sp, x_1),
-            Ap
-        )
+            valid_61 = B.jacobian_eq(lhs, rhs)
 
-        # Add g*^(-z)
-        for i in range(self.bitlength):
-            P = B.add_pubkeys(
-                B.multiply(getNUMS(i+1), -z % B.N),
-                P
-            )
+        if not valid_61:
+            print('(61) verification check failed')
+            return False
 
-        # zynz22n is the exponent of hprime
-        zynz22n = (yn * z) + (power_of_twos * z2)
+        with self.span('verify.reconstruct_p'):
+            # P, with H'_i = y^-i * H_i folded into the H_i coefficients
+            try:
+                coeffs, points, scalars = self.get_ipa_terms(
+                    transcript, y, z, x_1, uchallenge, Ap, Sp, t, mu, proof)
+            except ValueError:
+                return False
+
+        with self.span('verify.ipa'):
+            return B.isinf(B.jacobian_multiexp(
+                list(self.context.batch_generators) + [B.to_jacobian(p) for p in points],
+                coeffs + scalars
+            ))
+
+    def span(self, phase: str):
+        """
+        Times a phase of proving or verifying, see `pybp.tracing`
+        """
+        return tracing.span(phase, bitlength=self.bitlength, m=self.m)
 
-        for i in range(self.bitlength):
-            P = B.add_pubkeys(
-                B.multiply(hprime[i], zynz22n[i]),
-                P
-            )
+    def check_points(self, V, Ap, Sp, T1p, T2p, proof):
+        """
+        Raises ValueError unless the commitments and every point of the
+        proof are on the curve. Points decoded by `ProofView` already
+        are, but proof dicts may hold anything
+        """
+        _, _, L, R = proof
+        for p in list(V) + [Ap, Sp, T1p, T2p] + list(L) + list(R):
+            check_point(p)
 
-        fs_state, fs_challenge = fiat_shamir(
-            fs_state, [tau_x, mu, t], nret=1)
-        uchallenge: Scalar = fs_challenge[0]
-        U = B.multiply(B.G, uchallenge)
-        P = B.add_pubkeys(
-            B.multiply(U, t),
-            P
-        )
+    def as_commitment_list(self, V) -> List[Point]:
+        """
+        Accepts a single commitment (as a point) or a list of them
+
+        Raises ValueError for an empty list or anything else
+        """
+        if not isinstance(V, (list, tuple)) or len(V) == 0:
+            raise ValueError('Expected {} commitments'.format(self.m))
+
+        return [V] if isinstance(V[0], int) else list(V)
+
+    def get_batch_terms(self, Ap, Sp, T1p, T2p, tau_x, mu, t, proof, V) -> Tuple[Tuple, Tuple]:
+        """
+        Splits verification of a single proof into two equations which
+        must each sum to the point at infinity:
+
+        (61): (t - gexp)*G + tau_x*h - sum(z^(2+j)*V_j) - x*T1 - x^2*T2
+        IPA:  P + sum(x_j^2*L_j + x_j^-2*R_j)
+              - (a*b*u)*G - sum(a*s_i*G_i) - sum(b*s_i^-1*y^-i*H_i)
 
-        # P should now be : A + xS + -zG* + (zy^n+z^2.2^n)H'* + tU
-        # One can show algebraically (the working is omitted from the paper)
-        # that this will be the same as an inner product commitment to
-        # (lx, rx) vectors (whose inner product is t), thus the variable 'proof'
-        # can be passed into the IPC verify call, which should pass.
-        # input to inner product proof is P.h^-(mu)
-        p_prime = B.add_pubkeys(
-            P,
-            B.multiply(getNUMS(255), -mu % B.N)
+        where P = A + xS - zG* + (zy^nm+z22n)H'* + tuG - mu*h is expanded in
+        place, as the inner product challenges don't depend on it.
+
+        Each equation is returned as (coefficients of the shared generators
+        [G, h, G_1..G_nm, H_1..H_nm], proof specific points, their scalars)
+
+        Raises ValueError for a malformed proof: points which don't
+        decode or aren't on the curve, or the wrong number of commitments
+        or of L, R rounds
+        """
+        V = self.as_commitment_list(V)
+        if len(V) != self.m:
+            raise ValueError('Expected {} commitments, got {}'.format(self.m, len(V)))
+
+        self.check_points(V, Ap, Sp, T1p, T2p, proof)
+
+        transcript, y, z, x_1, uchallenge = self.replay_transcript(
+            V, Ap, Sp, T1p, T2p, tau_x, mu, t)
+
+        gexp: Scalar = self.get_gexp(y, z)
+
+        eq61 = (
+            [(t - gexp) % B.N, tau_x] + [0] * (2 * self.size),
+            V + [T1p, T2p],
+            [-pow(z, 2 + j, B.N) for j in range(self.m)] +
+            [-x_1 % B.N, -pow(x_1, 2, B.N)]
         )
 
-        a, b, L, R = proof
+        eqipa = self.get_ipa_terms(transcript, y, z, x_1, uchallenge, Ap, Sp, t, mu, proof)
 
-        iproof = InnerProductCommitment(
-            power_of_ones,
-            power_of_twos,
-            H=hprime,
-            U=U
+        return (eq61, eqipa)
+
+    def get_ipa_terms(self, transcript: Transcript, y, z, x_1, uchallenge, Ap, Sp, t, mu, proof) -> Tuple:
+        """
+        The inner product equation of `get_batch_terms`, for a transcript
+        replayed up to the inner product argument
+
+        Raises ValueError for the wrong number of L, R rounds
+        """
+        # y^-i, used to fold hprime back onto the H_i generators
+        yinv = modinv(y, B.N)
+        yinvn = to_powervector(yinv, self.size)
+        z22n = self.get_z22n(z)
+
+        a, b, L, R = proof
+        rounds = self.size.bit_length() - 1
+        if len(L) != rounds or len(R) != rounds:
+            raise ValueError('Expected {} inner product rounds'.format(rounds))
+
+        xs, xinvs = InnerProductCommitment.get_challenges(L, R, transcript)
+        s = InnerProductCommitment.get_s_vector(xs, xinvs)
+        s_inv = InnerProductCommitment.get_s_vector(xinvs, xs)
+
+        # H'_i = y^-i * H_i and U = uchallenge * G
+        return (
+            [(t - a * b) * uchallenge % B.N, -mu % B.N] +
+            [(-z - a * s_i) % B.N for s_i in s] +
+            [(z + (z22n[i] - b * s_i) * yinvn[i]) % B.N for i, s_i in enumerate(s_inv)],
+            [Ap, Sp] + list(L) + list(R),
+            [1, x_1] + [x * x % B.N for x in xs] + [xinv * xinv % B.N for xinv in xinvs]
         )
 
-        return iproof.verify_proof(a, b, p_prime, L, R)
+    def verify_batch(self, proofs: List[Tuple[Dict, Point]]) -> bool:
+        """
+        Verifies many proofs of the same bitlength at once.
+
+        Every proof's (61) and inner product equations are scaled by
+        fresh random weights and summed into a single multi-scalar
+        multiplication over the shared generators, which is the point at
+        infinity (with overwhelming probability) only if every proof is valid.
+
+        proofs: list of (proof dict as returned by get_proof_dict, V),
+        all for this bitlength and aggregation size
+
+        returns: Bool verdict for the whole batch, see `find_invalid`
+        to identify which proofs failed
+        """
+        terms = []
+        for proof, V in proofs:
+            try:
+                terms.append(self.get_batch_terms(V=V, **proof))
+            except ValueError:
+                return False
+
+        return self._verify_batch_terms(terms)
+
+    def find_invalid(self, proofs: List[Tuple[Dict, Point]]) -> List[int]:
+        """
+        Returns the indices of the invalid proofs in `proofs`, found by
+        bisecting batches which fail `verify_batch`
+        """
+        terms = []
+        for proof, V in proofs:
+            try:
+                terms.append(self.get_batch_terms(V=V, **proof))
+            except ValueError:
+                terms.append(None)
+
+        def bisect(indices: List[int]) -> List[int]:
+            if self._verify_batch_terms([terms[i] for i in indices]):
+                return []
+            if len(indices) == 1:
+                return indices
+            mid = len(indices) // 2
+            return bisect(indices[:mid]) + bisect(indices[mid:])
+
+        return bisect(list(range(len(proofs))))
+
+    def _verify_batch_terms(self, terms: List[Tuple[Tuple, Tuple]]) -> bool:
+        if any(term is None for term in terms):
+            return False
+
+        generators = self.context.batch_generators
+
+        shared = [0] * len(generators)
+        points = []
+        scalars = []
+
+        for eqs in terms:
+            for coeffs, eq_points, eq_scalars in eqs:
+                weight = get_batch_weight()
+                shared = [(acc + weight * c) % B.N
+                          for acc, c in zip(shared, coeffs)]
+                points += eq_points
+                scalars += [weight * s % B.N for s in eq_scalars]
+
+        return B.isinf(B.jacobian_multiexp(
+            list(generators) + [B.to_jacobian(p) for p in points],
+            shared + scalars
+        ))
@@ -0,0 +1,211 @@
+import pybitcointools as B
+
+from collections.abc import Mapping
+from typing import Dict, List, Union
+
+from pybp.types import Point, Scalar
+
+POINT_SIZE = 33
+SCALAR_SIZE = 32
+
+# Ap, Sp, T1p, T2p, then tau_x, mu, t and the inner product's a, b;
+# the L and R points of the log2(bitlength * m) rounds follow
+PROOF_POINTS = ['Ap', 'Sp', 'T1p', 'T2p']
+PROOF_SCALARS = ['tau_x', 'mu', 't']
+PROOF_HEADER_SIZE = POINT_SIZE * len(PROOF_POINTS) + SCALAR_SIZE * (len(PROOF_SCALARS) + 2)
+
+
+def encode_point(p: Point) -> bytes:
+    """
+    Compressed SEC encoding: 02/03 parity byte then x, 33 bytes
+    """
+    x, y = p
+    return bytes([2 + (y & 1)]) + x.to_bytes(32, 'big')
+
+
+def decode_point(buf) -> Point:
+    """
+    Inverse of `encode_point`, accepting any buffer of 33 bytes.
+    Raises ValueError unless it encodes a point on the curve
+    """
+    if len(buf) != POINT_SIZE or buf[0] not in (2, 3):
+        raise ValueError('Invalid compressed point encoding')
+
+    x = int.from_bytes(buf[1:], 'big')
+    if x >= B.P:
+        raise ValueError('Point x coordinate out of range')
+
+    y_sq = (x * x * x + B.A * x + B.B) % B.P
+    y = pow(y_sq, (B.P + 1) // 4, B.P)
+    if y * y % B.P != y_sq:
+        raise ValueError('Point is not on the curve')
+
+    if (y & 1) != buf[0] - 2:
+        y = B.P - y
+
+    return (x, y)
+
+
+def check_point(p: Point) -> Point:
+    """
+    Raises ValueError unless `p` is an affine point on the curve
+    """
+    try:
+        x, y = p
+    except (TypeError, ValueError):
+        raise ValueError('Invalid point')
+
+    if not (isinstance(x, int) and isinstance(y, int) and 0 <= x < B.P and 0 <= y < B.P):
+        raise ValueError('Point coordinates out of range')
+    if (y * y - x * x * x - B.A * x - B.B) % B.P != 0:
+        raise ValueError('Point is not on the curve')
+
+    return p
+
+
+def encode_scalar(s: Scalar) -> bytes:
+    return (s % B.N).to_bytes(SCALAR_SIZE, 'big')
+
+
+def decode_scalar(buf) -> Scalar:
+    """
+    Raises ValueError for scalars which aren't reduced mod N
+    """
+    s = int.from_bytes(buf, 'big')
+    if len(buf) != SCALAR_SIZE or s >= B.N:
+        raise ValueError('Invalid scalar encoding')
+
+    return s
+
+
+def proof_to_bytes(proof: Dict) -> bytes:
+    """
+    Canonical encoding of a proof as returned by
+    `RangeProof.get_proof_dict`:
+
+    Ap || Sp || T1p || T2p || tau_x || mu || t || a || b || L[] || R[]
+
+    i.e. 33*4 + 32*3 + (32*2 + 33*2*log_2(bitlength * m)) bytes
+    """
+    a, b, L, R = proof['proof']
+    assert len(L) == len(R)
+
+    return b''.join(
+        [encode_point(proof[key]) for key in PROOF_POINTS] +
+        [encode_scalar(proof[key]) for key in PROOF_SCALARS] +
+        [encode_scalar(a), encode_scalar(b)] +
+        [encode_point(p) for p in L] +
+        [encode_point(p) for p in R]
+    )
+
+
+class ProofView(Mapping):
+    """
+    Read-only view of an encoded proof, which behaves like the dict
+    returned by `RangeProof.get_proof_dict`, e.g.
+
+        RangeProof(bitlength, m).verify(V=V, **ProofView(buf))
+
+    `buf` may be any buffer (bytes, memoryview, mmap). It is not copied,
+    and a point is only decompressed (then cached) when first read, so
+    the buffer must not change while the view is in use
+    """
+
+    __slots__ = ('buf', 'rounds', '_cache')
+
+    def __init__(self, buf):
+        self.buf = memoryview(buf).cast('B')
+
+        rounds, rem = divmod(len(self.buf) - PROOF_HEADER_SIZE, 2 * POINT_SIZE)
+        if len(self.buf) < PROOF_HEADER_SIZE or rem != 0:
+            raise ValueError('Invalid proof length {}'.format(len(self.buf)))
+
+        self.rounds = rounds
+        self._cache = {}
+
+    def point(self, index: int) -> Point:
+        """
+        The index-th point of Ap, Sp, T1p, T2p, L[], R[]
+        """
+        if index not in self._cache:
+            offset = POINT_SIZE * index
+            if index >= len(PROOF_POINTS):
+                offset += SCALAR_SIZE * (len(PROOF_SCALARS) + 2)
+            self._cache[index] = decode_point(self.buf[offset:offset + POINT_SIZE])
+
+        return self._cache[index]
+
+    def scalar(self, index: int) -> Scalar:
+        """
+        The index-th scalar of tau_x, mu, t, a, b
+        """
+        offset = POINT_SIZE * len(PROOF_POINTS) + SCALAR_SIZE * index
+        return decode_scalar(self.buf[offset:offset + SCALAR_SIZE])
+
+    def __getitem__(self, key):
+        if key in PROOF_POINTS:
+            return self.point(PROOF_POINTS.index(key))
+        elif key in PROOF_SCALARS:
+            return self.scalar(PROOF_SCALARS.index(key))
+        elif key == 'proof':
+            first = len(PROOF_POINTS)
+            return (
+                self.scalar(len(PROOF_SCALARS)),
+                self.scalar(len(PROOF_SCALARS) + 1),
+                [self.point(first + i) for i in range(self.rounds)],
+                [self.point(first + self.rounds + i) for i in range(self.rounds)]
+            )
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(['proof'] + PROOF_SCALARS + PROOF_POINTS)
+
+    def __len__(self):
+        return 1 + len(PROOF_SCALARS) + len(PROOF_POINTS)
+
+    def to_dict(self) -> Dict:
+        return dict(self)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.buf)
+
+
+def proof_from_bytes(buf) -> ProofView:
+    return ProofView(buf)
+
+
+def as_proof_bytes(proof: Union[Dict, ProofView, bytes]) -> bytes:
+    """
+    Encoding of a proof dict, a `ProofView` or an already encoded proof
+    """
+    if isinstance(proof, ProofView):
+        return proof.to_bytes()
+    if isinstance(proof, dict):
+        return proof_to_bytes(proof)
+    return bytes(proof)
+
+
+def commitments_to_bytes(V: Union[Point, List[Point]]) -> bytes:
+    """
+    A single commitment, or the m commitments of an aggregated proof,
+    as consecutive compressed points
+    """
+    if not isinstance(V, (list, tuple)) or len(V) == 0:
+        raise ValueError('Expected at least one commitment')
+
+    V = [V] if isinstance(V[0], int) else V
+    return b''.join(encode_point(p) for p in V)
+
+
+def commitments_from_bytes(buf) -> Union[Point, List[Point]]:
+    """
+    Inverse of `commitments_to_bytes`, a single commitment being
+    returned as a point
+    """
+    buf = memoryview(buf).cast('B')
+    if len(buf) == 0 or len(buf) % POINT_SIZE != 0:
+        raise ValueError('Invalid commitments length {}'.format(len(buf)))
+
+    V = [decode_point(buf[i:i + POINT_SIZE]) for i in range(0, len(buf), POINT_SIZE)]
+    return V[0] if len(V) == 1 else V
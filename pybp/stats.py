@@ -0,0 +1,157 @@
+"""
+Opt-in operation counters
+
+    with pybp.stats.collect() as s:
+        rp.generate_proof(value)
+    s.counts['jacobian_multiply']
+
+While no collection is active nothing is instrumented, so there is no
+overhead at all. Entering the first `collect()` swaps every reference to
+a counted function held by the pybp and pybitcointools modules (and the
+counted methods on their classes) for a counting wrapper, and leaving
+the last one puts the originals back. Counts are process wide, so
+concurrent threads are counted together.
+"""
+import sys
+import functools
+
+from collections import Counter
+from typing import Callable, Dict, List, Tuple, Union
+
+# Counted functions, by the module defining them, and what they are
+# counted as when that isn't their name
+FUNCTIONS: Dict[str, List[str]] = {
+    'pybitcointools.main': [
+        'jacobian_add', 'jacobian_double', 'jacobian_multiply', 'jacobian_multiexp',
+        'from_jacobian', 'batch_to_affine', 'inv'
+    ],
+    'pybp.utils': ['modinv', 'getNUMS'],
+    'pybp.vectors': ['_evaluate']
+}
+COUNTER_NAMES = {'_evaluate': 'Vector.evaluate'}
+
+# Counted methods, by (module, class)
+METHODS: Dict[Tuple[str, str], List[str]] = {
+    ('pybp.vectors', 'Vector'): ['add', 'sub', 'hadamard', 'scale', 'fold', '__matmul__'],
+    ('pybp.utils', 'Transcript'): ['challenge_scalar']
+}
+
+# Modules whose references to counted functions are swapped
+PATCHED_MODULES = ('pybitcointools', 'pybp')
+
+_counts: Counter = Counter()
+_active: List['Collector'] = []
+_patches: List[Tuple[object, str, Callable]] = []
+
+
+def counted(name: str, fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _counts[name] += 1
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def install():
+    """
+    Instruments every counted function and method
+    """
+    __import__('pybitcointools.main')
+    __import__('pybp.utils')
+    __import__('pybp.vectors')
+
+    wrappers = {}
+    for module_name, names in FUNCTIONS.items():
+        module = sys.modules[module_name]
+        for name in names:
+            fn = getattr(module, name)
+            wrappers[id(fn)] = (fn, counted(COUNTER_NAMES.get(name, name), fn))
+
+    modules = [module for module_name, module in list(sys.modules.items())
+               if module is not None and module_name.split('.')[0] in PATCHED_MODULES]
+
+    for module in modules:
+        for attr, value in list(vars(module).items()):
+            if id(value) in wrappers and wrappers[id(value)][0] is value:
+                _patches.append((module, attr, value))
+                setattr(module, attr, wrappers[id(value)][1])
+
+    for (module_name, class_name), names in METHODS.items():
+        cls = getattr(sys.modules[module_name], class_name)
+        for name in names:
+            fn = cls.__dict__[name]
+            _patches.append((cls, name, fn))
+            setattr(cls, name, counted('{}.{}'.format(class_name, name.strip('_')), fn))
+
+
+def uninstall():
+    while _patches:
+        owner, attr, original = _patches.pop()
+        setattr(owner, attr, original)
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class Collector:
+    """
+    Counts of the operations performed since the collection started
+    """
+
+    def __init__(self, budget: Union[None, Dict[str, int]] = None):
+        self.budget = budget
+        self.start: Counter = Counter()
+        self.end: Union[None, Counter] = None
+
+    @property
+    def counts(self) -> Counter:
+        end = self.end if self.end is not None else _counts
+        return Counter({name: n - self.start[name]
+                        for name, n in end.items() if n - self.start[name] > 0})
+
+    def __getitem__(self, name: str) -> int:
+        return self.counts[name]
+
+    def check_budget(self, budget: Dict[str, int], per: int = 1):
+        """
+        Raises BudgetExceeded if any count exceeds its budget, e.g.
+        `s.check_budget({'inv': 12}, per=len(proofs))` for a budget per proof
+        """
+        counts = self.counts
+        over = {name: counts[name] for name, limit in budget.items()
+                if counts[name] > limit * per}
+
+        if over:
+            raise BudgetExceeded(', '.join(
+                '{}: {} > {}'.format(name, n, budget[name] * per)
+                for name, n in sorted(over.items())))
+
+    def __enter__(self):
+        if not _active:
+            install()
+        _active.append(self)
+        self.start = Counter(_counts)
+        return self
+
+    def __exit__(self, exc_type, *args):
+        self.end = Counter(_counts)
+        _active.remove(self)
+        if not _active:
+            uninstall()
+
+        if self.budget is not None and exc_type is None:
+            self.check_budget(self.budget)
+
+    def __repr__(self):
+        return 'Collector({})'.format(dict(sorted(self.counts.items())))
+
+
+def collect(budget: Union[None, Dict[str, int]] = None) -> Collector:
+    """
+    Context manager counting operations within it. With a `budget`
+    (operation name -> maximum count), leaving it raises BudgetExceeded
+    if any operation ran more often than allowed
+    """
+    return Collector(budget)
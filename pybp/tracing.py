@@ -0,0 +1,120 @@
+"""
+Per-phase timing of proving and verification
+
+    def record(phase, duration_ns, metadata):
+        ...
+
+    pybp.tracing.add_hook(record)
+
+Every phase of `RangeProof.generate_proof` and `RangeProof.verify` then
+calls record('prove.ipa', 1234567, {'bitlength': 64, 'm': 1}) once it
+finishes (see PHASES). OpenTelemetry tracers, or anything else with a
+`start_as_current_span(name, attributes=...)` context manager, can be
+added with `add_tracer` and get one span per phase, nested under a
+'prove' or 'verify' span.
+
+With no hooks or tracers registered a phase costs a single check.
+"""
+import time
+
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+Hook = Callable[[str, int, Dict], None]
+
+PHASES = [
+    'prove',
+    'prove.bits', 'prove.commit_as', 'prove.challenge_yz', 'prove.t_coefficients',
+    'prove.commit_t', 'prove.hprime', 'prove.ipa', 'prove.self_check',
+    'verify',
+    'verify.challenges', 'verify.check_61', 'verify.reconstruct_p', 'verify.ipa'
+]
+
+_hooks: List[Hook] = []
+_tracers: List[object] = []
+
+
+def add_hook(hook: Hook):
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook):
+    _hooks.remove(hook)
+
+
+def add_tracer(tracer):
+    _tracers.append(tracer)
+
+
+def remove_tracer(tracer):
+    _tracers.remove(tracer)
+
+
+@contextmanager
+def tracing(hook: Hook = None, tracer=None):
+    """
+    Registers `hook` and/or `tracer` for the duration of the block
+    """
+    if hook is not None:
+        add_hook(hook)
+    if tracer is not None:
+        add_tracer(tracer)
+    try:
+        yield
+    finally:
+        if hook is not None:
+            remove_hook(hook)
+        if tracer is not None:
+            remove_tracer(tracer)
+
+
+class Span:
+    """
+    Times a phase, reporting it to every hook and tracer registered
+    when it started
+    """
+    __slots__ = ('phase', 'metadata', 'hooks', 'spans', 'start')
+
+    def __init__(self, phase: str, metadata: Dict):
+        self.phase = phase
+        self.metadata = metadata
+        self.hooks = list(_hooks)
+        self.spans = [tracer.start_as_current_span(phase, attributes=metadata)
+                      for tracer in _tracers]
+
+    def __enter__(self):
+        for span in self.spans:
+            span.__enter__()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+
+        for hook in self.hooks:
+            hook(self.phase, duration, self.metadata)
+        for span in reversed(self.spans):
+            span.__exit__(*exc_info)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = NullSpan()
+
+
+def span(phase: str, **metadata):
+    """
+    Context manager timing `phase`, a no-op unless a hook or tracer
+    is registered
+    """
+    if not _hooks and not _tracers:
+        return _NULL_SPAN
+    return Span(phase, metadata)
@@ -4,6 +4,7 @@ from typing import Tuple
 
 
 Point = Tuple[int, int]
+JacobianPoint = Tuple[int, int, int]
 Scalar = int
 
 PrivateKey = Scalar
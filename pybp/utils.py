@@ -1,26 +1,13 @@
 import os
+import mmap
 import hashlib
 import pybitcointools as B
 import coincurve as C
 
-from functools import reduce
-from typing import Tuple, List, Union
-from pybp.types import Scalar, Point
+from typing import Callable, Dict, Tuple, List, Union
+from pybp.types import Scalar, Point, JacobianPoint
 from pybp.vectors import Vector
-
-
-def egcd(a: int, b: int) -> Tuple[int, int, int]:
-    """
-    Extended Euclidean Distance
-
-    return (g, x, y) such that a*x + b*y = g = gcd(x, y)
-    """
-    x0, x1, y0, y1 = 0, 1, 1, 0
-    while a != 0:
-        q, b, a = b // a, a, b % a
-        y0, y1 = y1, y0 - q * y1
-        x0, x1 = x1, x0 - q * x1
-    return b, x0, y0
+from pybp.serialize import check_point, encode_point
 
 
 def modinv(a: int, m: int = B.N) -> int:
@@ -29,17 +16,47 @@ def modinv(a: int, m: int = B.N) -> int:
 
     returns x where a * x = 1 mod m
     """
-
-    g, x, _ = egcd(a, m)
-    if g is not 1:
+    try:
+        return pow(a, -1, m)
+    except ValueError:
         raise Exception('Modular Inverse does not exist!')
-    return x % m
+
+
+# Memo of NUMS points already derived (or read) in this process
+_NUMS_CACHE: Dict[int, Point] = {}
+
+# Memory-mapped generator file, see `load_nums_file`
+_NUMS_FILE: Union[None, Tuple[mmap.mmap, int]] = None
+
+NUMS_FILE_MAGIC = b'PYBPNUMS'
+NUMS_FILE_HEADER_SIZE = len(NUMS_FILE_MAGIC) + 4 + 33 + 32
+NUMS_RECORD_SIZE = 64
 
 
 def getNUMS(index=0) -> Point:
     """
     Nothing Up My Sleeve
 
+    Returns the NUMS base point for `index` (see `derive_nums`).
+    Points are memoized per process, and read from the generator
+    file loaded by `load_nums_file` when it covers `index`, so
+    repeated lookups never redo the hash-to-curve search.
+    """
+    try:
+        return _NUMS_CACHE[index]
+    except KeyError:
+        pass
+
+    point = read_nums_file(index)
+    if point is None:
+        point = derive_nums(index)
+
+    _NUMS_CACHE[index] = point
+    return point
+
+
+def derive_nums(index=0) -> Point:
+    """
     Taking secp256k1's G as a seed,
     either in compressed or uncompressed form,
     append "index" as a byte, and append a second byte "counter"
@@ -75,6 +92,129 @@ def getNUMS(index=0) -> Point:
     raise Exception('NUMS generation inconceivable')
 
 
+def get_nums_cache() -> Dict[int, Point]:
+    """
+    Snapshot of the NUMS points derived so far, e.g. to hand to
+    `seed_nums_cache` in a worker process
+    """
+    return dict(_NUMS_CACHE)
+
+
+def seed_nums_cache(points: Dict[int, Point]):
+    _NUMS_CACHE.update(points)
+
+
+def build_nums_file(path: str, count: int = 256):
+    """
+    Writes the NUMS points for indices [0, count) to `path`
+
+    Layout: magic, count (4 bytes big endian), compressed G the points
+    were derived from, sha256 of the records, then `count` records of
+    x || y (32 bytes each)
+    """
+    records = b''.join(
+        x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+        for x, y in (getNUMS(index) for index in range(count)))
+
+    with open(path, 'wb') as f:
+        f.write(NUMS_FILE_MAGIC)
+        f.write(count.to_bytes(4, 'big'))
+        f.write(B.encode_pubkey(B.G, 'bin_compressed'))
+        f.write(hashlib.sha256(records).digest())
+        f.write(records)
+
+
+def load_nums_file(path: str):
+    """
+    Memory-maps a generator file written by `build_nums_file`, which
+    `getNUMS` then reads from instead of deriving points. The records
+    must match the digest in the header, and each is checked to be on
+    the curve when first read
+    """
+    global _NUMS_FILE
+
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if mm[:len(NUMS_FILE_MAGIC)] != NUMS_FILE_MAGIC:
+            raise Exception('Not a NUMS generator file: {}'.format(path))
+
+        offset = len(NUMS_FILE_MAGIC)
+        count = int.from_bytes(mm[offset:offset + 4], 'big')
+        G = mm[offset + 4:offset + 37]
+        digest = mm[offset + 37:NUMS_FILE_HEADER_SIZE]
+
+        if G != B.encode_pubkey(B.G, 'bin_compressed'):
+            raise Exception('NUMS generator file was built for a different G')
+
+        end = NUMS_FILE_HEADER_SIZE + count * NUMS_RECORD_SIZE
+        if len(mm) < end:
+            raise Exception('Truncated NUMS generator file: {}'.format(path))
+
+        if hashlib.sha256(mm[NUMS_FILE_HEADER_SIZE:end]).digest() != digest:
+            raise Exception('NUMS generator file does not match its digest: {}'.format(path))
+    except BaseException:
+        mm.close()
+        raise
+
+    # Replacing a file unmaps the previous one
+    if _NUMS_FILE is not None:
+        _NUMS_FILE[0].close()
+
+    _NUMS_FILE = (mm, count)
+
+
+def read_nums_file(index: int) -> Union[None, Point]:
+    if _NUMS_FILE is None:
+        return None
+
+    mm, count = _NUMS_FILE
+    if not 0 <= index < count:
+        return None
+
+    offset = NUMS_FILE_HEADER_SIZE + index * NUMS_RECORD_SIZE
+    point = (
+        int.from_bytes(mm[offset:offset + 32], 'big'),
+        int.from_bytes(mm[offset + 32:offset + 64], 'big')
+    )
+
+    try:
+        return check_point(point)
+    except ValueError:
+        raise Exception('NUMS generator file record {} is not on the curve'.format(index))
+
+
+if os.environ.get('PYBP_NUMS_FILE'):
+    load_nums_file(os.environ['PYBP_NUMS_FILE'])
+
+
+def nums_index(i: int) -> int:
+    """
+    Maps the i-th vector generator to a NUMS index, stepping over
+    255 which is reserved for the blinding generator h
+    """
+    return i if i < 255 else i + 1
+
+
+def get_generators(n: int) -> Tuple[List[Point], List[Point]]:
+    """
+    Vector generators (G_1..G_n, H_1..H_n) shared by the inner product
+    commitments and range proofs of length n
+    """
+    G = [getNUMS(nums_index(i + 1)) for i in range(n)]
+    H = [getNUMS(nums_index(n + i + 1)) for i in range(n)]
+    return (G, H)
+
+
+def as_jacobian(p: Union[Point, JacobianPoint]) -> JacobianPoint:
+    """
+    Lifts an affine point to Jacobian coordinates,
+    Jacobian points are returned as they are
+    """
+    return p if len(p) == 3 else B.to_jacobian(p)
+
+
 def split(a: List[any]) -> Tuple[List[any], List[any]]:
     try:
         a[:]
@@ -85,57 +225,93 @@ def split(a: List[any]) -> Tuple[List[any], List[any]]:
     return (a[:mid], a[mid:])
 
 
-def get_blinding_value() -> Scalar:
-    return B.encode_privkey(os.urandom(32), 'decimal')
+def get_blinding_value(randbytes: Callable[[int], bytes] = os.urandom) -> Scalar:
+    """
+    randbytes: source of the random bytes, see `RangeProof`
+    """
+    return B.encode_privkey(randbytes(32), 'decimal')
 
 
-def get_blinding_vector(length) -> Vector:
-    return Vector([get_blinding_value() for i in range(length)])
+def get_blinding_vector(length, randbytes: Callable[[int], bytes] = os.urandom) -> Vector:
+    return Vector([get_blinding_value(randbytes) for i in range(length)])
 
 
-def fiat_shamir(fs_state: bytes,
-                data: Union[List[Point], List[Scalar]],
-                nret=2) -> Tuple[bytes, List[Scalar]]:
+class MemoizedCommitment:
     """
-    Generates nret integer chllange values from the currnet
-    interaction (data) and the previous challenge values (self.fs_state),
-    thus fulfilling the requirement of basing the challenge on the transcript of the
-    prover-verifier communication up to this point
+    Caches the commitment of a subclass, which implements
+    `compute_commitment` (in Jacobian coordinates) and lists the
+    attributes it is computed from in INPUTS. Reassigning any of them
+    clears the cache
     """
-    # Point type
-    if isinstance(data[0], tuple):
-        data_bs: bytes = reduce(lambda acc, x: acc +
-                                B.encode_pubkey(x, 'bin'), data, b"")
-
-    # Scalar type
-    elif isinstance(data[0], int):
-        data_bs: bytes = reduce(lambda acc, x: acc +
-                                B.encode_privkey(x, 'bin'), data, b"")
 
-    else:
-        raise Exception('Invalid `data` param type for fiat_shamir')
+    INPUTS = frozenset()
 
-    xb: bytes = hashlib.sha256(fs_state + data_bs).digest()
+    def __setattr__(self, name, value):
+        if name in self.INPUTS:
+            self.__dict__['_jacobian'] = None
+            self.__dict__['_commitment'] = None
+        self.__dict__[name] = value
 
-    challenges: List[Scalar] = []
+    def compute_commitment(self) -> JacobianPoint:
+        raise NotImplementedError
 
-    for _ in range(nret):
-        challenges.append(B.encode_privkey(xb, 'decimal'))
-        xb = hashlib.sha256(xb).digest()
+    def get_jacobian_commitment(self) -> JacobianPoint:
+        if self._jacobian is None:
+            self._jacobian = self.compute_commitment()
+        return self._jacobian
 
-    return xb, challenges
+    def get_commitment(self) -> Point:
+        if self._commitment is None:
+            self._commitment = B.from_jacobian(self.get_jacobian_commitment())
+        return self._commitment
 
 
-def bytes_to_xes(b: bytes) -> Tuple[Scalar, Scalar, Scalar, Scalar]:
+class Transcript:
     """
-    Convinient function
+    Fiat-Shamir transcript of the prover-verifier interaction, kept as an
+    incremental SHA256 state so each message is hashed exactly once.
+
+    Points are absorbed compressed (33 bytes) and scalars as 32 bytes.
+    Every challenge is the hash of the transcript so far, and is itself
+    absorbed, so successive challenges differ and each one commits to
+    everything before it. `clone` forks the state, e.g. so a prover can
+    check its own inner product argument from the same point onwards
+    """
+
+    __slots__ = ('state',)
 
-    Converts bytes to a scalar (x), and calculates 
+    def __init__(self, label: bytes = b''):
+        self.state = hashlib.sha256(label)
+
+    def append_point(self, p: Point):
+        self.state.update(encode_point(p))
+
+    def append_points(self, ps: List[Point]):
+        for p in ps:
+            self.state.update(encode_point(p))
+
+    def append_scalar(self, s: Scalar):
+        self.state.update((s % B.N).to_bytes(32, 'big'))
+
+    def append_scalars(self, ss: List[Scalar]):
+        for s in ss:
+            self.append_scalar(s)
+
+    def challenge_scalar(self) -> Scalar:
+        digest = self.state.digest()
+        self.state.update(digest)
+        return int.from_bytes(digest, 'big') % B.N
+
+    def clone(self):
+        ret = Transcript.__new__(Transcript)
+        ret.state = self.state.copy()
+        return ret
+
+
+def get_xes(x: Scalar) -> Tuple[Scalar, Scalar, Scalar, Scalar]:
+    """
     x, x^2, inv(x), and inv(x^2)
     """
-    x: Scalar = B.encode_privkey(b, 'decimal') % B.N
-    x_sq: Scalar = pow(x, 2, B.N)
     xinv: Scalar = modinv(x, B.N)
-    xinv_sq: Scalar = pow(xinv, 2, B.N)
 
-    return (x, x_sq, xinv, xinv_sq)
+    return (x, x * x % B.N, xinv, xinv * xinv % B.N)
@@ -1,26 +1,102 @@
+import operator
 import pybitcointools as B
 
 from pybp.types import Scalar
 from typing import List, Tuple
 
 
+# Largest number of (reduced) factors multiplied together inside one
+# fused expression before an operand is materialized, bounding the size
+# of the unreduced intermediates
+MAX_FUSED_DEGREE = 4
+
+# Longest chain of pending operations a Vector may hold; an operand at
+# this depth is materialized before another operation is stacked on it,
+# bounding the recursion of evaluating an expression
+MAX_FUSED_DEPTH = 8
+
+_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul}
+
+
 class Vector:
     """
     Vector with elements in Z_n, where n is the 'size'
+
+    Elements are reduced once on construction; every kernel keeps its
+    result in range, so derived Vectors adopt their storage directly.
+
+    The +, - and * operators are lazy: they return a Vector holding an
+    expression over their operands. The expression is evaluated in a
+    single pass over the operand lists, with one reduction per element,
+    when it is first consumed by `@`, indexing, iteration or
+    `materialize()`, and the result is cached. Subexpressions shared by
+    several expressions are evaluated once
     """
 
+    __slots__ = ('_vals', '_expr', '_len', '_refs', '_depth', 'size')
+
     def __init__(self,
                  v: List[int],
                  size: int = B.N):
         assert isinstance(v, List)
-        assert len(v) in [1, 2, 4, 8, 16, 32, 64]
-        for i in v:
-            assert isinstance(i, int)
 
         # Make sure they're in range
-        self.vals = [i % size for i in v]
+        self._vals = [i % size for i in v]
+        self._expr = None
+        self._len = len(v)
+        self._refs = 0
+        self._depth = 0
         self.size = size
 
+    @classmethod
+    def from_reduced(cls, vals: List[int], size: int = B.N):
+        """
+        Takes ownership of `vals`, which must already be reduced mod size
+        """
+        ret = cls.__new__(cls)
+        ret._vals = vals
+        ret._expr = None
+        ret._len = len(vals)
+        ret._refs = 0
+        ret._depth = 0
+        ret.size = size
+        return ret
+
+    @classmethod
+    def from_expr(cls, op: str, lhs, rhs, length: int, size: int):
+        ret = cls.__new__(cls)
+        ret._depth = 1
+        for operand in (lhs, rhs):
+            if isinstance(operand, Vector) and operand._expr is not None:
+                if operand._depth >= MAX_FUSED_DEPTH:
+                    operand.materialize()
+                else:
+                    # Only pending expressions are shared by reference
+                    # counting; concrete Vectors, such as the constants of
+                    # a shared BulletproofContext, are never written to
+                    operand._refs += 1
+                ret._depth = max(ret._depth, operand._depth + 1)
+        ret._vals = None
+        ret._expr = (op, lhs, rhs)
+        ret._len = length
+        ret._refs = 0
+        ret.size = size
+        return ret
+
+    @property
+    def vals(self) -> List[int]:
+        return self.materialize()._vals
+
+    def materialize(self):
+        """
+        Evaluates a pending expression in place and drops its operands
+        """
+        if self._expr is not None:
+            self._vals = _evaluate(self)
+            self._expr = None
+            self._depth = 0
+        return self
+
     def operate(self, f):
         """
         Partial function used for arbitrary operations on self.vals
@@ -28,37 +104,74 @@ class Vector:
         Params:
         f: Lambda function
         """
-        newV = [f(idx, self.vals[idx]) %
-                self.size for idx in range(len(self.vals))]
-        return Vector(newV, size=self.size)
+        size = self.size
+        return Vector.from_reduced(
+            [f(idx, x) % size for idx, x in enumerate(self.vals)], size)
+
+    def add(self, other):
+        assert len(other) == self._len
+        q = self.size
+        return Vector.from_reduced(
+            [s if s < q else s - q for s in map(operator.add, self.vals, other.vals)], q)
+
+    def sub(self, other):
+        assert len(other) == self._len
+        q = self.size
+        return Vector.from_reduced(
+            [d if d >= 0 else d + q for d in map(operator.sub, self.vals, other.vals)], q)
+
+    def hadamard(self, other):
+        assert len(other) == self._len
+        return Vector.from_reduced(
+            list(map(self.size.__rmod__, map(operator.mul, self.vals, other.vals))),
+            self.size)
+
+    def scale(self, k: int):
+        q = self.size
+        k = k % q
+        return Vector.from_reduced([k * x % q for x in self.vals], q)
+
+    def fold(self, lo: int, hi: int):
+        """
+        Halves the vector as in one inner product round:
+
+        v'_i = lo * v_i + hi * v_(i + n/2)
+        """
+        vals = self.vals
+        half = len(vals) // 2
+        assert 2 * half == len(vals)
+        q = self.size
+        return Vector.from_reduced(
+            [(lo * x + hi * y) % q for x, y in zip(vals[:half], vals[half:])], q)
 
     def __sub__(self, other):
         assert isinstance(other, Vector)
-        return self.operate(lambda idx, x: x - other.vals[idx])
+        assert len(other) == self._len
+        return Vector.from_expr('-', self, other, self._len, self.size)
 
     def __add__(self, other):
         assert isinstance(other, Vector)
-        return self.operate(lambda idx, x: x + other.vals[idx])
+        assert len(other) == self._len
+        return Vector.from_expr('+', self, other, self._len, self.size)
 
     def __mul__(self, other):
         if isinstance(other, Vector):
-            return self.operate(lambda idx, x: x * other.vals[idx])
+            assert len(other) == self._len
+            return Vector.from_expr('*', self, other, self._len, self.size)
         elif isinstance(other, int):
-            return self.operate(lambda _, x: x * other)
+            return Vector.from_expr('*', self, other % self.size, self._len, self.size)
 
         raise Exception('Invalid multiplication type')
 
-    def __eq__(self, other):
-        assert isinstance(other, Vector)
-
-        if len(other) is not len(self.vals):
-            return False
+    def __rmul__(self, other):
+        if isinstance(other, int):
+            return self * other
 
-        for i, j in zip(other.vals, self.vals):
-            if i is not j:
-                return False
+        raise Exception('Invalid multiplication type')
 
-        return True
+    def __eq__(self, other):
+        assert isinstance(other, Vector)
+        return self.vals == other.vals
 
     def __getitem__(self, key):
         ret = self.vals[key]
@@ -66,30 +179,70 @@ class Vector:
         if not isinstance(ret, List):
             return ret
 
-        return Vector(ret)
+        return Vector.from_reduced(ret, self.size)
 
     def __len__(self):
-        return len(self.vals)
+        return self._len
 
     def __iter__(self):
-        self.n = 0
-        return self
-
-    def __next__(self):
-        if self.n < len(self.vals):
-            ret = self.vals[self.n]
-            self.n = self.n + 1
-            return ret
-        raise StopIteration
+        return iter(self.vals)
 
     def __matmul__(self, other) -> Scalar:
         assert isinstance(other, Vector)
-        return sum((self * other)) % self.size
+        assert len(other) == self._len
+        return sum(map(operator.mul, self.vals, other.vals)) % self.size
 
     def __repr__(self):
         return str(self.vals)
 
 
+def _degree(node) -> int:
+    """
+    Number of reduced factors multiplied together in one element of `node`
+    """
+    if isinstance(node, int) or node._expr is None:
+        return 1
+
+    op, lhs, rhs = node._expr
+    if op == '*':
+        return _degree(lhs) + _degree(rhs)
+    return max(_degree(lhs), _degree(rhs))
+
+
+def _stream(node, root=False):
+    """
+    Iterator over the unreduced elements of `node`, chaining lazy maps
+    so the whole expression is computed in a single pass
+    """
+    if node._expr is not None and not root and node._refs > 1:
+        # Expressions that feed several others are evaluated once and cached
+        node.materialize()
+
+    if node._expr is None:
+        return iter(node._vals)
+
+    op, lhs, rhs = node._expr
+
+    if op == '*' and _degree(lhs) + _degree(rhs) > MAX_FUSED_DEGREE:
+        # Keep unreduced products bounded by evaluating the larger side
+        if _degree(lhs) >= _degree(rhs):
+            lhs.materialize()
+        else:
+            rhs.materialize()
+
+    if isinstance(rhs, int):
+        return map(rhs.__mul__, _stream(lhs))
+
+    return map(_OPERATORS[op], _stream(lhs), _stream(rhs))
+
+
+def _evaluate(node) -> List[int]:
+    """
+    Evaluates the expression held by `node`, reducing every element once
+    """
+    return list(map(node.size.__rmod__, _stream(node, root=True)))
+
+
 def to_bitvector(val: int, bitlength: int, size=B.N) -> Vector:
     """
     Returns a Vector with `val` in binary form with specified bitlength,
@@ -122,6 +275,9 @@ def to_powervector(val: int, length: int, size=B.N) -> Vector:
     """
     assert isinstance(val, int)
 
-    vals = [pow(val, k, size) for k in range(length)]
+    val = val % size
+    vals = [1 % size] if length > 0 else []
+    for _ in range(length - 1):
+        vals.append(vals[-1] * val % size)
 
-    return Vector(vals, size)
+    return Vector.from_reduced(vals, size)
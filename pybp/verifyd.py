@@ -0,0 +1,314 @@
+"""
+Range proof verification daemon
+
+    python -m pybp.verifyd --socket /tmp/pybp.sock
+
+Accepts proofs over a Unix domain socket, collects them for up to
+--max-delay-ms milliseconds or --max-batch proofs, and verifies each
+collection with `RangeProof.verify_batch` on a pool of warm worker
+processes, so callers share both the batching and the derived generators.
+
+Every request and reply is a frame: 4 byte big endian length, then a
+body. Request bodies are binary,
+    bitlength (1 byte) || m (2 bytes big endian) || V_1..V_m || proof
+with the commitments as compressed points and the proof as encoded by
+`RangeProof.to_bytes`. Points are only decompressed by the workers.
+Replies are JSON, {"valid": bool} or {"error": str}, sent in request
+order on each connection.
+
+Frames over --max-frame bytes are answered with an error and the
+connection is closed, and proofs aggregating more than --max-m values
+are rejected before reaching a worker. At most two batches per worker
+are verified or waiting for a worker at once, and at most --max-queue
+requests wait behind them; beyond that, connections stop being read.
+"""
+import os
+import json
+import socket
+import asyncio
+import argparse
+
+import pybitcointools as B
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+from pybp.parallel import warm_worker
+from pybp.rangeproof import BITLENGTHS, RangeProof
+from pybp.serialize import POINT_SIZE, ProofView, as_proof_bytes, commitments_from_bytes, commitments_to_bytes
+from pybp.types import Point
+from pybp.utils import getNUMS, get_generators, get_nums_cache
+
+FRAME_HEADER_SIZE = 4
+REQUEST_HEADER_SIZE = 3
+
+MAX_FRAME = 64 * 1024
+MAX_M = 16
+MAX_QUEUE = 1024
+
+
+def encode_request(proof: Union[Dict, ProofView, bytes],
+                   V: Union[Point, List[Point]],
+                   bitlength: int,
+                   m: int = 1) -> bytes:
+    """
+    proof: anything `pybp.serialize.as_proof_bytes` accepts
+    """
+    return bytes([bitlength]) + m.to_bytes(2, 'big') + commitments_to_bytes(V) + as_proof_bytes(proof)
+
+
+def decode_request(body: bytes, max_m: int = MAX_M) -> Tuple[int, int, bytes, bytes]:
+    """
+    Inverse of `encode_request`, only checking the sizes; returns
+    (bitlength, m, encoded proof, encoded commitments)
+    """
+    if len(body) < REQUEST_HEADER_SIZE:
+        raise ValueError('Request too short')
+
+    bitlength = body[0]
+    m = int.from_bytes(body[1:REQUEST_HEADER_SIZE], 'big')
+    if bitlength not in BITLENGTHS:
+        raise ValueError('Unsupported bitlength {}'.format(bitlength))
+    if m & (m - 1) != 0 or not 0 < m <= max_m:
+        raise ValueError('Aggregation size must be a power of 2 up to {}'.format(max_m))
+    proof_offset = REQUEST_HEADER_SIZE + POINT_SIZE * m
+
+    V = body[REQUEST_HEADER_SIZE:proof_offset]
+    proof = body[proof_offset:]
+    if len(V) != POINT_SIZE * m:
+        raise ValueError('Expected {} commitments'.format(m))
+
+    ProofView(proof)
+
+    return (bitlength, m, proof, V)
+
+
+def frame(body: bytes) -> bytes:
+    return len(body).to_bytes(FRAME_HEADER_SIZE, 'big') + body
+
+
+def verify_group(bitlength: int, m: int, requests: List[Tuple[bytes, bytes]]) -> List[bool]:
+    """
+    Runs on a worker: verifies all proofs of one size, given as
+    (encoded proof, encoded commitments), as one batch, bisecting only
+    when the batch fails. Commitments which don't decode fail their proof
+    """
+    rp = RangeProof(bitlength, m)
+
+    verdicts = [False] * len(requests)
+    indices = []
+    proofs = []
+    for i, (proof, V) in enumerate(requests):
+        try:
+            proofs.append((ProofView(proof), commitments_from_bytes(V)))
+            indices.append(i)
+        except ValueError:
+            pass
+
+    if rp.verify_batch(proofs):
+        invalid = set()
+    else:
+        invalid = set(rp.find_invalid(proofs))
+
+    for j, i in enumerate(indices):
+        verdicts[i] = j not in invalid
+
+    return verdicts
+
+
+class VerifyDaemon:
+    def __init__(self,
+                 socket_path: str,
+                 max_delay_ms: float = 5,
+                 max_batch: int = 64,
+                 workers: Union[None, int] = None,
+                 max_frame: int = MAX_FRAME,
+                 max_m: int = MAX_M,
+                 max_queue: int = MAX_QUEUE):
+        self.socket_path = socket_path
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch = max_batch
+        self.workers = workers or os.cpu_count() or 1
+        self.max_frame = max_frame
+        self.max_m = max_m
+        self.max_queue = max_queue
+
+        self.queue: Union[None, asyncio.Queue] = None
+        self.executor: Union[None, ProcessPoolExecutor] = None
+
+        # Batches in flight, and the slots bounding how many there are
+        self.tasks = set()
+        self.slots: Union[None, asyncio.Semaphore] = None
+
+    async def serve(self):
+        self.queue = asyncio.Queue(self.max_queue)
+        self.slots = asyncio.Semaphore(self.workers * 2)
+
+        # Derive the common generators once and hand them to the workers
+        get_generators(64)
+        getNUMS(0)
+        getNUMS(255)
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=warm_worker,
+            initargs=(get_nums_cache(), B.get_backend())
+        )
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        batcher = asyncio.ensure_future(self.batch_loop())
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Reads requests off one connection as fast as they arrive, while
+        replies are written back in order as their batches complete
+        """
+        replies: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.ensure_future(self.send_replies(replies, writer))
+
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER_SIZE)
+                length = int.from_bytes(header, 'big')
+
+                result = asyncio.get_running_loop().create_future()
+                if length > self.max_frame:
+                    # The stream can't be resynchronised without reading
+                    # the body, so the connection ends here
+                    result.set_result({'error': 'request of {} bytes exceeds {}'.format(
+                        length, self.max_frame)})
+                    await replies.put(result)
+                    break
+
+                body = await reader.readexactly(length)
+
+                try:
+                    bitlength, m, proof, V = decode_request(body, self.max_m)
+                except Exception as e:
+                    result.set_result({'error': 'malformed request: {}'.format(e)})
+                else:
+                    # Waits while the queue is full, so no more is read
+                    await self.queue.put(((bitlength, m), (proof, V), result))
+
+                await replies.put(result)
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            await replies.put(None)
+            await sender
+
+    async def send_replies(self, replies: asyncio.Queue, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                result = await replies.get()
+                if result is None:
+                    break
+                writer.write(frame(json.dumps(await result).encode('utf-8')))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            # A slow pool holds batches back in the queue, which in turn
+            # stops connections being read
+            await self.slots.acquire()
+
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[Tuple[int, int], List] = {}
+            for key, item, result in batch:
+                groups.setdefault(key, []).append((item, result))
+
+            task = asyncio.gather(*(self.verify(bitlength, m, group)
+                                    for (bitlength, m), group in groups.items()))
+            self.tasks.add(task)
+            task.add_done_callback(self.batch_done)
+
+    def batch_done(self, task: asyncio.Future):
+        self.tasks.discard(task)
+        self.slots.release()
+
+    async def verify(self, bitlength: int, m: int, group: List):
+        loop = asyncio.get_running_loop()
+        try:
+            verdicts = await loop.run_in_executor(
+                self.executor, verify_group, bitlength, m, [item for item, _ in group])
+            replies = [{'valid': verdict} for verdict in verdicts]
+        except Exception as e:
+            replies = [{'error': str(e)}] * len(group)
+
+        for (_, result), reply in zip(group, replies):
+            result.set_result(reply)
+
+
+def request_verify(socket_path: str, proof: Union[Dict, ProofView, bytes], V: Union[Point, List[Point]], bitlength: int, m: int = 1) -> bool:
+    """
+    Blocking client for a single proof
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(frame(encode_request(proof, V, bitlength, m)))
+
+        stream = sock.makefile('rb')
+        header = stream.read(FRAME_HEADER_SIZE)
+        reply = json.loads(stream.read(int.from_bytes(header, 'big')).decode('utf-8'))
+
+    if 'error' in reply:
+        raise Exception(reply['error'])
+
+    return reply['valid']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Range proof verification daemon')
+    parser.add_argument('--socket', default='/tmp/pybp-verifyd.sock',
+                        help='Unix domain socket to listen on')
+    parser.add_argument('--max-delay-ms', type=float, default=5,
+                        help='How long to collect proofs before verifying them')
+    parser.add_argument('--max-batch', type=int, default=64,
+                        help='Verify as soon as this many proofs are collected')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Verifier processes (defaults to the number of CPUs)')
+    parser.add_argument('--max-frame', type=int, default=MAX_FRAME,
+                        help='Largest request accepted, in bytes')
+    parser.add_argument('--max-m', type=int, default=MAX_M,
+                        help='Largest aggregation size accepted')
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE,
+                        help='Requests waiting for a batch before connections stop being read')
+    args = parser.parse_args()
+
+    daemon = VerifyDaemon(args.socket, args.max_delay_ms, args.max_batch, args.workers,
+                          args.max_frame, args.max_m, args.max_queue)
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()